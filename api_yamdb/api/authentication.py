@@ -0,0 +1,169 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Model
+from django.utils.functional import SimpleLazyObject
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User
+
+AUTH_HASH_CLAIM = 'auth_hash'
+AUTH_HASH_KEY = 'api:auth-hash:{}'
+REVOKED = 'revoked'
+
+
+def user_auth_hash(user):
+    """Отпечаток роли и флагов доступа пользователя."""
+    if not user.is_active:
+        return REVOKED
+    state = (
+        f'{user.pk}:{user.username}:{user.role}:'
+        f'{user.is_staff}:{user.is_superuser}'
+    )
+    return hashlib.sha1(
+        f'{settings.SECRET_KEY}:{state}'.encode()
+    ).hexdigest()[:16]
+
+
+def get_auth_hash(user_id):
+    """Возвращает отпечаток прав пользователя из кеша.
+
+    Отпечаток хранится не дольше API_AUTH_HASH_TIMEOUT секунд, поэтому
+    изменения в обход сигналов (QuerySet.update, другая база кеша)
+    отзывают токены с задержкой не больше этого срока.
+    """
+    key = AUTH_HASH_KEY.format(user_id)
+    auth_hash = cache.get(key)
+    if auth_hash is None:
+        user = User.objects.filter(pk=user_id).only(
+            'pk', 'username', 'role', 'is_staff', 'is_superuser', 'is_active'
+        ).first()
+        auth_hash = REVOKED if user is None else user_auth_hash(user)
+        cache.set(key, auth_hash, settings.API_AUTH_HASH_TIMEOUT)
+    return auth_hash
+
+
+def update_auth_hash(user):
+    cache.set(
+        AUTH_HASH_KEY.format(user.pk), user_auth_hash(user),
+        settings.API_AUTH_HASH_TIMEOUT
+    )
+
+
+def revoke_auth_hash(user):
+    cache.set(
+        AUTH_HASH_KEY.format(user.pk), REVOKED, settings.API_AUTH_HASH_TIMEOUT
+    )
+
+
+def reset_auth_hashes(user_ids):
+    """Сбрасывает отпечатки пользователей, изменённых в обход сигналов."""
+    cache.delete_many([AUTH_HASH_KEY.format(user_id) for user_id in user_ids])
+
+
+def get_user_instance(user):
+    """Возвращает объект User для пользователя из токена."""
+    if isinstance(user, TokenUser):
+        return User.objects.get(pk=user.pk)
+    return user
+
+
+def access_token_for(user):
+    """Выпускает токен с ролью и флагами пользователя в утверждениях."""
+    token = AccessToken.for_user(user)
+    token['username'] = user.username
+    token['role'] = user.role
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token[AUTH_HASH_CLAIM] = user_auth_hash(user)
+    return token
+
+
+class TokenUser(SimpleLazyObject):
+    """Пользователь, построенный по утверждениям токена.
+
+    Поля, нужные для проверки прав, читаются из токена, а остальные
+    атрибуты загружают объект User из базы при первом обращении.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, token):
+        user_id = token[api_settings.USER_ID_CLAIM]
+        super().__init__(lambda: User.objects.get(pk=user_id))
+        self.__dict__['token'] = token
+
+    @property
+    def pk(self):
+        return self.token[api_settings.USER_ID_CLAIM]
+
+    id = pk
+
+    @property
+    def username(self):
+        return self.token['username']
+
+    @property
+    def role(self):
+        return self.token['role']
+
+    @property
+    def is_staff(self):
+        return self.token['is_staff']
+
+    @property
+    def is_superuser(self):
+        return self.token['is_superuser']
+
+    @property
+    def is_admin(self):
+        return self.role == User.UserRole.ADMIN
+
+    @property
+    def is_moderator(self):
+        return self.role == User.UserRole.MODERATOR
+
+    @property
+    def is_user(self):
+        return self.role == User.UserRole.USER
+
+    def __eq__(self, other):
+        if isinstance(other, TokenUser) or (
+                isinstance(other, Model)
+                and other._meta.concrete_model is User):
+            return other.pk == self.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return self.username
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация без загрузки пользователя на каждый запрос.
+
+    Токены без утверждений о правах обрабатываются как раньше.
+    """
+
+    def get_user(self, validated_token):
+        if AUTH_HASH_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Токен не содержит идентификатор пользователя')
+        if get_auth_hash(user_id) != validated_token[AUTH_HASH_CLAIM]:
+            raise AuthenticationFailed(
+                'Права пользователя изменились, получите новый токен',
+                code='token_revoked'
+            )
+        return TokenUser(validated_token)
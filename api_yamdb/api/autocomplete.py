@@ -0,0 +1,167 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from itertools import groupby
+
+from django.db.models import Count
+
+from reviews.models import Category, Genre, Title
+from reviews.utils import normalize_search_key
+
+from .cache import NAMES_VERSION_KEY, VersionedIndex
+
+BUILD_CHUNK_SIZE = 10000
+TOP_N = 10
+# Для коротких префиксов диапазон совпадений велик, поэтому лучшие
+# варианты вычисляются заранее.
+SHORT_PREFIX = 3
+KINDS = ('title', 'genre', 'category')
+
+
+class AutocompleteIndex(VersionedIndex):
+    """Отсортированный индекс названий произведений, жанров и категорий.
+
+    Ключи поиска лежат в отсортированном списке, остальные колонки - в
+    параллельных массивах. Совпадения по префиксу занимают непрерывный
+    диапазон, который находится двоичным поиском. Варианты упорядочены
+    по популярности: у произведений - число отзывов, у жанров и
+    категорий - число произведений. Популярность обновляется при
+    перестроении, поэтому пересчёт рейтинга индекс не сбрасывает.
+    Новое или переименованное название вставляется на своё место в
+    списке, и пересчитываются лучшие варианты его коротких префиксов.
+    """
+
+    models = (Category, Genre, Title)
+    version_key = NAMES_VERSION_KEY
+    model_kinds = {Title: 0, Genre: 1, Category: 2}
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self.keys = []
+        self.names = []
+        self.kinds = array('B')
+        self.ids = array('I')
+        self.weights = array('I')
+        self.slugs = {}
+        self.top = {}
+
+    def entries(self):
+        titles = Title.objects.values_list(
+            'search_name', 'name', 'pk', 'review_count'
+        ).order_by()
+        for key, name, pk, weight in titles.iterator(
+                chunk_size=BUILD_CHUNK_SIZE):
+            yield key, name, 0, pk, weight
+        for kind, model in enumerate((Genre, Category), 1):
+            rows = model.objects.annotate(weight=Count('titles')).values_list(
+                'search_name', 'name', 'pk', 'weight', 'slug'
+            ).order_by()
+            for key, name, pk, weight, slug in rows:
+                self.slugs[kind, pk] = slug
+                yield key, name, kind, pk, weight
+
+    def load(self):
+        self.clear()
+        for key, name, kind, pk, weight in sorted(
+                self.entries(), key=lambda entry: (entry[0], entry[2])):
+            if not key:
+                continue
+            self.keys.append(key)
+            self.names.append(name)
+            self.kinds.append(kind)
+            self.ids.append(pk)
+            self.weights.append(weight)
+        for length in range(1, SHORT_PREFIX + 1):
+            start = 0
+            for prefix, group in groupby(
+                    self.keys, key=lambda key: key[:length]):
+                end = start + sum(1 for _ in group)
+                if len(prefix) == length:
+                    self.top[prefix] = self.best(start, end)
+                start = end
+
+    def best(self, start, end, limit=TOP_N):
+        """Лучшие варианты диапазона: (вид, id, название)."""
+        return [
+            (self.kinds[position], self.ids[position], self.names[position])
+            for position in heapq.nlargest(
+                limit, range(start, end), key=self.weights.__getitem__
+            )
+        ]
+
+    def prefix_range(self, key):
+        upper = key[:-1] + chr(ord(key[-1]) + 1)
+        return bisect_left(self.keys, key), bisect_left(self.keys, upper)
+
+    def position(self, kind, pk):
+        """Позиция варианта в списке или None; поиск линейный."""
+        position = -1
+        while True:
+            try:
+                position = self.ids.index(pk, position + 1)
+            except ValueError:
+                return None
+            if self.kinds[position] == kind:
+                return position
+
+    def apply_change(self, model, change):
+        """Учитывает запись журнала: новое название или удаление."""
+        kind, pk, key = self.model_kinds[model], change['pk'], change['key']
+        weight = change.get('weight', 0)
+        prefixes = set()
+        position = self.position(kind, pk)
+        if position is not None:
+            prefixes.add(self.keys[position])
+            weight = self.weights[position]
+            for column in (self.keys, self.names, self.kinds, self.ids,
+                           self.weights):
+                del column[position]
+        if key:
+            prefixes.add(key)
+            position = bisect_left(self.keys, key)
+            while (position < len(self.keys) and self.keys[position] == key
+                   and self.kinds[position] <= kind):
+                position += 1
+            self.keys.insert(position, key)
+            self.names.insert(position, change['name'])
+            self.kinds.insert(position, kind)
+            self.ids.insert(position, pk)
+            self.weights.insert(position, weight)
+        if kind:
+            self.slugs.pop((kind, pk), None)
+            if key:
+                self.slugs[kind, pk] = change['slug']
+        for prefix in {
+                old[:length] for old in prefixes
+                for length in range(1, min(len(old), SHORT_PREFIX) + 1)}:
+            self.top[prefix] = self.best(*self.prefix_range(prefix))
+            if not self.top[prefix]:
+                del self.top[prefix]
+
+    def search(self, text, limit=TOP_N):
+        """Лучшие по популярности варианты, начинающиеся с text."""
+        key = normalize_search_key(text)
+        if not key:
+            return []
+        limit = min(limit, TOP_N)
+        with self.lock:
+            self.ensure_fresh()
+            if len(key) <= SHORT_PREFIX:
+                best = self.top.get(key, ())[:limit]
+            else:
+                best = self.best(*self.prefix_range(key), limit)
+            return [self.entry(*variant) for variant in best]
+
+    def entry(self, kind, pk, name):
+        entry = {'type': KINDS[kind], 'name': name}
+        if kind:
+            entry['slug'] = self.slugs[kind, pk]
+        else:
+            entry['id'] = pk
+        return entry
+
+
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,270 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'api:version:{}'
+NAMES_VERSION_KEY = 'api:names-version:{}'
+NAMES_CHANGE_KEY = 'api:names-change:{}:{}'
+MODIFIED_KEY = 'api:modified:{}'
+COUNT_KEY = 'api:count:{}'
+RESPONSE_KEY = 'api:response:{}'
+STATS_KEYS = {'hits': 'api:stats:hits', 'misses': 'api:stats:misses'}
+# Запись журнала после изменений в обход сигналов, например загрузки.
+REBUILD = 'rebuild'
+# Отставание индекса, после которого он перестраивается, а не догоняет.
+MAX_CATCH_UP = 1000
+
+
+def model_key(model):
+    return model._meta.label_lower
+
+
+def initial_version():
+    """Начальная версия - время в микросекундах.
+
+    После очистки кеша версии не начинаются заново с тех же чисел, и
+    индексы в памяти процессов не примут старую версию за актуальную.
+    """
+    return time.time_ns() // 1000
+
+
+def get_versions(models, template=VERSION_KEY):
+    """Возвращает текущие версии данных перечисленных моделей."""
+    keys = [template.format(model_key(model)) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = initial_version()
+            cache.add(key, version, timeout=None)
+            versions[key] = cache.get(key, version)
+    return tuple(versions[key] for key in keys)
+
+
+def increment_version(key):
+    """Увеличивает версию и возвращает её или None, если ключа не было."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, initial_version(), timeout=None)
+        return None
+
+
+def bump_version(model):
+    """Увеличивает версию данных модели после её изменения."""
+    increment_version(VERSION_KEY.format(model_key(model)))
+    cache.set(
+        MODIFIED_KEY.format(model_key(model)), time.time(), timeout=None
+    )
+
+
+def bump_names_version(model, change=REBUILD):
+    """Увеличивает версию названий: создание, удаление, переименование.
+
+    Индексы названий сверяются с ней, а не с версией данных модели,
+    которая меняется, например, при каждом пересчёте рейтинга. Изменение
+    записывается в журнал под новой версией, и индексы других процессов
+    применяют его без перестроения. Без `change` индексы перестраиваются.
+    """
+    version = increment_version(NAMES_VERSION_KEY.format(model_key(model)))
+    if version is not None:
+        cache.set(
+            NAMES_CHANGE_KEY.format(model_key(model), version), change,
+            settings.API_NAMES_CHANGE_TIMEOUT
+        )
+
+
+def get_names_changes(model, first, last):
+    """Записи журнала названий model с версии first по last включительно.
+
+    Возвращает список изменений или None, если индекс нужно перестроить:
+    запись вытеснена из кеша или отмечает изменения в обход сигналов.
+    Запись последней версии может быть ещё не опубликована, тогда она
+    не входит в список.
+    """
+    if last - first >= MAX_CATCH_UP:
+        return None
+    keys = [
+        NAMES_CHANGE_KEY.format(model_key(model), version)
+        for version in range(first, last + 1)
+    ]
+    entries = cache.get_many(keys)
+    changes = []
+    for key in keys:
+        change = entries.get(key)
+        if change is None and key == keys[-1]:
+            break
+        if change is None or change == REBUILD:
+            return None
+        changes.append(change)
+    return changes
+
+
+def get_last_modified(models):
+    """Возвращает время последнего изменения данных моделей.
+
+    Время хранится с долями секунды: заголовок Last-Modified точен
+    только до секунды, и по ним видно изменение в текущей секунде.
+    """
+    keys = [MODIFIED_KEY.format(model_key(model)) for model in models]
+    modified = cache.get_many(keys)
+    for key in keys:
+        if key not in modified:
+            cache.add(key, time.time(), timeout=None)
+            modified[key] = cache.get(key)
+    return max(modified.values())
+
+
+def response_etag(request, models):
+    """Строгий ETag ответа, вычисляемый без обращения к базе данных."""
+    return hashlib.sha1(repr((
+        request.path,
+        normalize_query(request.query_params),
+        request.accepted_renderer.format,
+        request.user.pk,
+        get_versions(models)
+    )).encode()).hexdigest()
+
+
+def make_key(template, *parts):
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return template.format(digest)
+
+
+def normalize_query(query_params, exclude=()):
+    """Приводит параметры запроса к каноническому виду."""
+    return tuple(sorted(
+        (name, tuple(sorted(query_params.getlist(name))))
+        for name in query_params
+        if name not in exclude
+    ))
+
+
+def cached_count(queryset, key_parts, models, limit=None):
+    """Возвращает количество записей и признак точного подсчёта.
+
+    Если задан limit, подсчёт останавливается после limit записей.
+    """
+    key = make_key(COUNT_KEY, key_parts, get_versions(models))
+    count = cache.get(key)
+    if count is not None:
+        return count, True
+    if limit is not None:
+        count = queryset.order_by()[:limit + 1].count()
+        if count > limit:
+            return limit, False
+    else:
+        count = queryset.count()
+    cache.set(key, count, settings.API_CACHE_TIMEOUT)
+    return count, True
+
+
+def response_cache_key(request, models):
+    """Ключ ответа: путь, параметры запроса, формат и версии данных."""
+    return make_key(
+        RESPONSE_KEY,
+        request.path,
+        normalize_query(request.query_params),
+        request.accepted_renderer.format,
+        get_versions(models)
+    )
+
+
+def get_cached_response(key):
+    """Возвращает данные и статус закешированного ответа."""
+    cached = cache.get(key)
+    count_event('hits' if cached is not None else 'misses')
+    return cached
+
+
+def set_cached_response(key, data, status):
+    cache.set(key, (data, status), settings.API_CACHE_TIMEOUT)
+
+
+def count_event(name):
+    try:
+        cache.incr(STATS_KEYS[name])
+    except ValueError:
+        cache.add(STATS_KEYS[name], 0, timeout=None)
+        cache.incr(STATS_KEYS[name])
+
+
+def cache_stats():
+    """Возвращает счётчики попаданий и промахов кеша ответов."""
+    values = cache.get_many(STATS_KEYS.values())
+    return {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+
+
+class VersionedIndex:
+    """Основа индексов в памяти процесса, сверяемых с версиями в кеше.
+
+    Индекс строится при старте процесса (warm_up_indexes) или первом
+    запросе и хранит версии `models` (ключи по шаблону `version_key`),
+    с которыми он совпадает. Если версии в общем кеше ушли вперёд,
+    индекс применяет записи журнала изменений через apply_change(), а
+    если журнала не хватает - перестраивается.
+    """
+
+    models = ()
+    version_key = VERSION_KEY
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+
+    def current_version(self):
+        return get_versions(self.models, self.version_key)
+
+    def load(self):
+        raise NotImplementedError
+
+    def apply_change(self, model, change):
+        raise NotImplementedError
+
+    def build(self):
+        with self.lock:
+            version = self.current_version()
+            self.load()
+            self.version = version
+
+    def ensure_fresh(self):
+        current = self.current_version()
+        if self.version != current and not self.catch_up(current):
+            self.build()
+
+    def catch_up(self, current):
+        """Применяет журнал изменений до версий current.
+
+        Журнал ведётся только для версий названий. Возвращает False,
+        если индекс нужно перестроить.
+        """
+        if self.version is None or self.version_key != NAMES_VERSION_KEY:
+            return False
+        pending = []
+        for model, indexed, latest in zip(
+                self.models, self.version, current):
+            if latest == indexed:
+                pending.append((model, indexed, ()))
+                continue
+            if latest < indexed:
+                return False
+            changes = get_names_changes(model, indexed + 1, latest)
+            if changes is None:
+                return False
+            pending.append((model, indexed + len(changes), changes))
+        for model, _, changes in pending:
+            for change in changes:
+                self.apply_change(model, change)
+        self.version = tuple(version for _, version, _ in pending)
+        return True
+
+    def refresh(self):
+        """Догоняет версию в кеше, если индекс уже построен."""
+        with self.lock:
+            if self.version is not None:
+                self.ensure_fresh()
+
+    def invalidate(self):
+        self.version = None
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+# incr() и add() этих бэкендов - отдельные чтение и запись, поэтому
+# одновременные изменения из разных процессов теряют сдвиги версий.
+NON_ATOMIC_CACHES = (
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.db.DatabaseCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Кеш API должен быть общим для процессов сервера и атомарным.
+
+    Иначе изменение данных в одном процессе не сбрасывает кешированные
+    ответы и токены в других, а одновременные изменения получают одну
+    и ту же версию данных.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.DEBUG:
+        return []
+    if backend in PROCESS_LOCAL_CACHES:
+        message = f'Бэкенд кеша {backend} не общий для процессов сервера.'
+    elif backend in NON_ATOMIC_CACHES:
+        message = f'Бэкенд кеша {backend} не увеличивает версии атомарно.'
+    else:
+        return []
+    return [Error(
+        message,
+        hint='Укажите memcached или redis в CACHE_BACKEND и CACHE_LOCATION.',
+        id='api.E001',
+    )]
@@ -1,12 +1,18 @@
+import operator
+from functools import reduce
+
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend, SearchFilter
 
-from reviews.models import Title
+from reviews.fts import fts_filter, search_fts
+from reviews.models import Comment, Review, Title
+from reviews.utils import contains_filter, prefix_filter
 
 
 class TitleFilter(filters.FilterSet):
     name = filters.CharFilter(
-        field_name='name',
-        lookup_expr='contains'
+        field_name='search_name',
+        method='filter_name'
     )
     category = filters.CharFilter(
         field_name='category__slug',
@@ -24,3 +30,70 @@ class TitleFilter(filters.FilterSet):
     class Meta:
         model = Title
         fields = ('category', 'genre', 'name', 'year')
+
+    def filter_name(self, queryset, name, value):
+        """Название начинается с value или содержит слова, начинающиеся
+        со слов value. Оба условия проверяются по индексам: ключа поиска
+        и FTS5 по колонке названия.
+        """
+        condition = prefix_filter(name, value)
+        if condition is None:
+            return queryset.none()
+        words = fts_filter(Title, value, columns=('name',))
+        if words is not None:
+            condition |= words
+        return queryset.filter(condition)
+
+
+class SearchKeyFilter(SearchFilter):
+    """Поиск `?search=` по подстроке нормализованных ключей `search_fields`.
+
+    Не важны регистр, ё/е, диакритика и знаки препинания. Фильтр
+    используется для небольших таблиц, поэтому поиск подстроки, как у
+    SearchFilter, не требует индекса.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        text = ' '.join(self.get_search_terms(request))
+        if not search_fields or not text:
+            return queryset
+        conditions = [
+            contains_filter(field_name, text) for field_name in search_fields
+        ]
+        if conditions[0] is None:
+            return queryset.none()
+        return queryset.filter(reduce(operator.or_, conditions))
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """Полнотекстовый поиск `?search=` по индексу FTS5 модели вьюсета."""
+
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param)
+        if text is None:
+            return queryset
+        return search_fts(queryset, text)
+
+
+class ReviewModerationFilter(filters.FilterSet):
+    author = filters.CharFilter(field_name='author__username')
+    title = filters.NumberFilter(field_name='title_id')
+    pub_date = filters.IsoDateTimeFromToRangeFilter()
+
+    class Meta:
+        model = Review
+        fields = ('author', 'title', 'pub_date')
+
+
+class CommentModerationFilter(filters.FilterSet):
+    author = filters.CharFilter(field_name='author__username')
+    title = filters.NumberFilter(field_name='review__title_id')
+    review = filters.NumberFilter(field_name='review_id')
+    pub_date = filters.IsoDateTimeFromToRangeFilter()
+
+    class Meta:
+        model = Comment
+        fields = ('author', 'title', 'review', 'pub_date')
@@ -0,0 +1,38 @@
+import logging
+import threading
+
+from django.db import connection
+
+from .autocomplete import autocomplete_index
+from .trigram import title_index
+
+NAME_INDEXES = (title_index, autocomplete_index)
+
+logger = logging.getLogger(__name__)
+
+
+def build_indexes():
+    """Строит индексы названий, ошибки только записываются в журнал."""
+    try:
+        for index in NAME_INDEXES:
+            try:
+                with index.lock:
+                    index.ensure_fresh()
+            except Exception:
+                logger.exception('Не удалось построить индекс %s.',
+                                 type(index).__name__)
+    finally:
+        connection.close()
+
+
+def warm_up_indexes():
+    """Строит индексы в фоне при старте процесса.
+
+    Первые запросы к поиску ждут построения под блокировкой индекса,
+    а не строят его каждый заново.
+    """
+    thread = threading.Thread(
+        target=build_indexes, name='index-warm-up', daemon=True
+    )
+    thread.start()
+    return thread
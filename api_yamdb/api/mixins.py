@@ -1,13 +1,146 @@
-from rest_framework import filters, mixins, viewsets
+import time
 
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.response import Response
+
+from .cache import (get_cached_response, get_last_modified,
+                    response_cache_key, response_etag, set_cached_response)
+from .filters import SearchKeyFilter
 from .permissions import IsSuperuserOrAdminPermission, ReadOnlyPermission
+from .projection import project_queryset
+
+
+class ConditionalResponse(Exception):
+    """Прерывает обработку запроса готовым ответом 304."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """Поддержка ETag и Last-Modified для GET-запросов.
+
+    Валидаторы строятся по версиям моделей из `cache_models`, поэтому
+    ответ 304 отдаётся до выполнения запроса к базе и сериализации.
+    Last-Modified точен до секунды, и пока не закончилась секунда
+    последнего изменения, он не отдаётся и не проверяется: следующее
+    изменение в ту же секунду клиент по нему не заметил бы.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method not in ('GET', 'HEAD') or not getattr(
+                self, 'cache_models', None):
+            return
+        self.etag = quote_etag(response_etag(request, self.cache_models))
+        self.last_modified = int(get_last_modified(self.cache_models))
+        if self.last_modified >= int(time.time()):
+            self.last_modified = None
+        response = get_conditional_response(
+            request, etag=self.etag, last_modified=self.last_modified
+        )
+        if response is not None:
+            raise ConditionalResponse(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ConditionalResponse):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if getattr(self, 'etag', None) and response.status_code in (
+                status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = self.etag
+            if self.last_modified is not None:
+                response['Last-Modified'] = http_date(self.last_modified)
+        return response
+
+
+class CachedResponseMixin:
+    """Кеширует ответы на анонимные GET-запросы до изменения данных.
+
+    Ключ включает версии моделей из атрибута `cache_models` вьюсета.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.method not in permissions.SAFE_METHODS or (
+                request.user.is_authenticated):
+            return handler(request, *args, **kwargs)
+        key = response_cache_key(request, self.cache_models)
+        cached = get_cached_response(key)
+        if cached is not None:
+            data, status_code = cached
+            response = Response(data, status=status_code)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_cached_response(key, response.data, response.status_code)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class SerializerProjectionMixin:
+    """Подгоняет выборку чтения под поля сериализатора ответа."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+        serializer_class = self.get_serializer_class()
+        return project_queryset(
+            queryset,
+            serializer_class(context=self.get_serializer_context())
+        )
+
+
+class NestedParentMixin:
+    """Родительские объекты вложенного маршрута загружаются один раз.
+
+    Найденные объекты хранятся во вьюсете, который создаётся на каждый
+    запрос, поэтому queryset, сериализатор и perform_create получают один
+    и тот же экземпляр. Список дочерних записей фильтруется по
+    идентификаторам из URL, а существование родителя проверяется
+    отдельным запросом только для пустой страницы.
+    """
+
+    def get_parent(self, queryset, **lookups):
+        parents = self.__dict__.setdefault('_parents', {})
+        key = (queryset.model, tuple(sorted(lookups.items())))
+        if key not in parents:
+            parents[key] = get_object_or_404(queryset, **lookups)
+        return parents[key]
+
+    def get_parent_object(self):
+        raise NotImplementedError
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and not page:
+            self.get_parent_object()
+        return page
 
 
-class CreateListDestroyViewSet(mixins.CreateModelMixin,
+class CreateListDestroyViewSet(ConditionalGetMixin,
+                               CachedResponseMixin,
+                               SerializerProjectionMixin,
+                               mixins.CreateModelMixin,
                                mixins.ListModelMixin,
                                mixins.DestroyModelMixin,
                                viewsets.GenericViewSet):
     permission_classes = (ReadOnlyPermission | IsSuperuserOrAdminPermission,)
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('name',)
+    filter_backends = (SearchKeyFilter,)
+    search_fields = ('search_name',)
     lookup_field = 'slug'
+    cursor_ordering = ('name', 'id')
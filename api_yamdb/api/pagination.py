@@ -0,0 +1,268 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import (EmptyPage, Page, PageNotAnInteger,
+                                   Paginator)
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .cache import cached_count, normalize_query
+
+SERVICE_QUERY_PARAMS = (
+    'page', 'page_size', 'cursor', 'pagination', 'count', 'ordering'
+)
+
+
+def count_key_parts(request):
+    """Ключ подсчёта: путь и параметры фильтрации без служебных."""
+    return (
+        request.path,
+        normalize_query(request.query_params, SERVICE_QUERY_PARAMS)
+    )
+
+
+class EstimatedPage(Page):
+    """Страница, у которой наличие следующей известно без подсчёта."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self.next_exists = has_next
+
+    def has_next(self):
+        return self.next_exists
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор, кеширующий количество записей до изменения данных."""
+
+    def __init__(self, object_list, per_page, key_parts, models,
+                 count_limit=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.key_parts = key_parts
+        self.models = models
+        self.count_limit = count_limit
+        self.exact_count = True
+
+    @cached_property
+    def count(self):
+        count, self.exact_count = cached_count(
+            self.object_list, self.key_parts, self.models, self.count_limit
+        )
+        return count
+
+    def validate_number(self, number):
+        if not self.count or self.exact_count:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.exact_count:
+            return super().page(number)
+        # Оценка ограничена сверху, поэтому следующая страница
+        # определяется по лишней выбранной записи.
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return EstimatedPage(
+            rows[:self.per_page], number, self, len(rows) > self.per_page
+        )
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация по полям `cursor_ordering` вьюсета.
+
+    Общее количество записей считается только по запросу `?count=true`.
+    """
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(view.cursor_ordering)
+        self.base_url = request.build_absolute_uri()
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count, _ = cached_count(
+                queryset,
+                count_key_parts(request),
+                getattr(view, 'cache_models', ())
+            )
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def decode_cursor(self, request, model):
+        """Позиция и направление из курсора с проверкой значений.
+
+        Значения приводятся к типам полей сортировки, поэтому подделанный
+        курсор даёт 404, а не ошибку базы данных.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+                len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                self._to_python(model, field.lstrip('-'), value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, instance, reverse):
+        position = [
+            self._value(instance, field.lstrip('-'))
+            for field in self.ordering
+        ]
+        cursor = json.dumps({'p': position, 'r': int(reverse)})
+        encoded = base64.urlsafe_b64encode(cursor.encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    @staticmethod
+    def _value(instance, field):
+        value = getattr(instance, field)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def _to_python(model, field, value):
+        if value is None:
+            raise ValueError('Пустое значение в курсоре.')
+        return model._meta.get_field(field).to_python(value)
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _after(ordering, position):
+        """Строит условие «строго после позиции» для набора полей."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+
+class PageNumberOrKeysetPagination(PageNumberPagination):
+    """Постраничная пагинация с переходом на курсорную по запросу.
+
+    Курсорный режим включается параметрами `?pagination=cursor`
+    или `?cursor=` во вьюсетах с атрибутом `cursor_ordering`.
+    Количество записей кешируется для вьюсетов с `cache_models`,
+    а параметр `?count=estimated` ограничивает подсчёт сверху.
+    """
+
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        self.view = view
+        self.estimate_count = (
+            request.query_params.get(self.count_query_param) == 'estimated'
+        )
+        self.count_key_parts = count_key_parts(request)
+        if self.use_keyset(request, view):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, object_list, per_page):
+        models = getattr(self.view, 'cache_models', None)
+        if not models:
+            return Paginator(object_list, per_page)
+        return CachedCountPaginator(
+            object_list,
+            per_page,
+            self.count_key_parts,
+            models,
+            settings.API_ESTIMATED_COUNT_LIMIT if self.estimate_count
+            else None
+        )
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        response = super().get_paginated_response(data)
+        if self.estimate_count:
+            response.data['count_is_exact'] = getattr(
+                self.page.paginator, 'exact_count', True
+            )
+        return response
+
+    def use_keyset(self, request, view):
+        if getattr(view, 'cursor_ordering', None) is None:
+            return False
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
@@ -26,3 +26,12 @@ class ReadOnlyPermission(permissions.BasePermission):
 
     def has_permission(self, request, view):
         return request.method in permissions.SAFE_METHODS
+
+
+class IsModeratorOrAdminPermission(permissions.BasePermission):
+
+    def has_permission(self, request, view):
+        return (request.user.is_authenticated
+                and (request.user.is_moderator
+                     or request.user.is_admin
+                     or request.user.is_superuser))
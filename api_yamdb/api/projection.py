@@ -0,0 +1,108 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import relations, serializers
+
+
+def project_queryset(queryset, serializer):
+    """Ограничивает выборку полями и связями, которые выводит сериализатор.
+
+    Прямые связи подгружаются через select_related, множественные -
+    через Prefetch с собственной проекцией, а колонки, не попадающие
+    в ответ, исключаются из SELECT через only().
+    """
+    only, select, prefetch = serializer_plan(serializer, queryset.model)
+    if only is not None:
+        # Связанный менеджер проставляет родителя по значению внешнего ключа.
+        only.update(field.name for field in queryset._known_related_objects)
+    return apply_plan(queryset, (only, select, prefetch))
+
+
+def apply_plan(queryset, plan):
+    only, select, prefetch = plan
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if only is not None:
+        queryset = queryset.only(*only)
+    return queryset
+
+
+def serializer_plan(serializer, model):
+    """Возвращает поля для only(), select_related и prefetch_related."""
+    only, select, prefetch = {model._meta.pk.name}, [], []
+    restricted = True
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            restricted = False
+            continue
+        name = field.source_attrs[0]
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            restricted = False
+            continue
+        if not model_field.is_relation:
+            only.add(name)
+            continue
+        related_model = model_field.related_model
+        if model_field.many_to_many or model_field.one_to_many:
+            prefetch.append(Prefetch(name, queryset=apply_plan(
+                related_model._default_manager.all(),
+                related_plan(field, related_model)
+            )))
+            continue
+        if not model_field.concrete:
+            restricted = False
+            continue
+        only.add(name)
+        forward_only, forward_select, forward_prefetch = forward_plan(
+            name, field, related_model
+        )
+        only.update(forward_only)
+        select.extend(forward_select)
+        prefetch.extend(forward_prefetch)
+    return (only if restricted else None), select, prefetch
+
+
+def forward_plan(name, field, related_model):
+    """План выборки объекта по прямой связи с префиксом пути `name`."""
+    related_only, related_select, related_prefetch = related_plan(
+        field, related_model
+    )
+    if related_only == {related_model._meta.pk.name}:
+        return set(), [], []
+    if related_only is None:
+        related_only = {
+            related_field.name
+            for related_field in related_model._meta.concrete_fields
+        }
+    return (
+        {f'{name}__{path}' for path in related_only},
+        [name] + [f'{name}__{path}' for path in related_select],
+        [_prefixed_prefetch(name, lookup) for lookup in related_prefetch]
+    )
+
+
+def related_plan(field, related_model):
+    """План выборки связанного объекта для поля сериализатора."""
+    pk_name = related_model._meta.pk.name
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    if isinstance(field, relations.ManyRelatedField):
+        field = field.child_relation
+    if isinstance(field, serializers.BaseSerializer):
+        return serializer_plan(field, related_model)
+    if isinstance(field, relations.SlugRelatedField):
+        return {pk_name, field.slug_field}, [], []
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        return {pk_name}, [], []
+    return None, [], []
+
+
+def _prefixed_prefetch(prefix, lookup):
+    return Prefetch(
+        f'{prefix}__{lookup.prefetch_through}', queryset=lookup.queryset
+    )
@@ -1,7 +1,6 @@
 import datetime as dt
 
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
@@ -97,12 +96,41 @@ class TitleGetSerializer(serializers.ModelSerializer):
         many=False
     )
     rating = serializers.IntegerField(
-        required=False
+        read_only=True
+    )
+
+    class Meta:
+        model = Title
+        fields = (
+            'id', 'name', 'year', 'rating', 'description', 'genre', 'category'
+        )
+
+
+class TitleRatingSerializer(serializers.ModelSerializer):
+    histogram = serializers.ListField(
+        source='score_histogram',
+        child=serializers.IntegerField()
+    )
+    mean = serializers.FloatField(
+        source='rating'
+    )
+    median = serializers.FloatField(
+        source='score_median'
+    )
+    count = serializers.IntegerField(
+        source='review_count'
     )
 
     class Meta:
         model = Title
-        fields = '__all__'
+        fields = ('histogram', 'mean', 'median', 'count')
+        read_only_fields = fields
+
+
+class TitleFuzzySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    similarity = serializers.FloatField()
 
 
 class TitleSerializer(serializers.ModelSerializer):
@@ -126,7 +154,7 @@ class TitleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Title
-        fields = '__all__'
+        fields = ('id', 'name', 'year', 'description', 'genre', 'category')
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -147,8 +175,7 @@ class ReviewSerializer(serializers.ModelSerializer):
     def validate(self, data):
         request = self.context['request']
         author = request.user
-        title_id = self.context['view'].kwargs.get('title_id')
-        title = get_object_or_404(Title, pk=title_id)
+        title = self.context['view'].get_title()
         if request.method == 'POST':
             if Review.objects.filter(title=title, author=author).exists():
                 raise ValidationError('Вы не можете добавить более'
@@ -161,10 +188,24 @@ class ReviewSerializer(serializers.ModelSerializer):
 
 
 class CommentSerializer(serializers.ModelSerializer):
-    author = serializers.StringRelatedField(
-        read_only=True
+    author = serializers.SlugRelatedField(
+        read_only=True,
+        slug_field='username'
     )
 
     class Meta:
         model = Comment
         fields = ('id', 'text', 'author', 'pub_date')
+
+
+class ModerationReviewSerializer(ReviewSerializer):
+
+    class Meta(ReviewSerializer.Meta):
+        fields = ReviewSerializer.Meta.fields + ('title',)
+
+
+class ModerationCommentSerializer(CommentSerializer):
+    title = serializers.IntegerField(source='review.title_id', read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ('review', 'title')
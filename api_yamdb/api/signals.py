@@ -0,0 +1,103 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .authentication import revoke_auth_hash, update_auth_hash
+from .cache import bump_names_version, bump_version
+from .indexes import NAME_INDEXES
+from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
+from users.models import User
+
+VERSIONED_MODELS = (Category, Genre, Title, GenreTitle, Review, Comment, User)
+NAMED_MODELS = (Category, Genre, Title)
+
+# Версии сдвигаются и индексы обновляются после фиксации транзакции:
+# иначе параллельный запрос может прочитать новую версию вместе со старыми
+# данными и закешировать их под новой версией.
+on_commit = transaction.on_commit
+
+
+def bump_model_version(sender, **kwargs):
+    """Сбрасывает кеш, зависящий от изменённой модели."""
+    if kwargs.get('raw'):
+        return
+    on_commit(partial(bump_version, sender))
+
+
+def bump_title_version(sender, action, **kwargs):
+    """Сбрасывает кеш произведений при изменении их жанров."""
+    if action.startswith('post_'):
+        on_commit(partial(bump_version, Title))
+
+
+def bump_rating_version(sender, raw=False, **kwargs):
+    """Рейтинг произведения меняется запросом UPDATE без сигналов."""
+    if not raw:
+        on_commit(partial(bump_version, Title))
+
+
+def names_changed(instance, created):
+    return created or instance.search_keys_changed
+
+
+def publish_names_change(model, change):
+    """Записывает изменение в журнал названий и догоняет индексы."""
+    bump_names_version(model, change)
+    for index in NAME_INDEXES:
+        if model in index.models:
+            index.refresh()
+
+
+def names_change(instance, deleted=False):
+    """Запись журнала названий, которую индексы применяют без запросов."""
+    change = {'pk': instance.pk, 'key': None}
+    if not deleted:
+        change.update(key=instance.search_name, name=instance.name)
+        if hasattr(instance, 'slug'):
+            change['slug'] = instance.slug
+        if hasattr(instance, 'review_count'):
+            change['weight'] = instance.review_count
+    return change
+
+
+def publish_saved_name(sender, instance, raw=False, created=False,
+                       **kwargs):
+    """Передаёт индексам новое название при создании и переименовании.
+
+    Остальные изменения, например пересчёт рейтинга, индексы не трогают.
+    """
+    if not raw and names_changed(instance, created):
+        on_commit(partial(
+            publish_names_change, sender, names_change(instance)
+        ))
+
+
+def publish_deleted_name(sender, instance, **kwargs):
+    on_commit(partial(
+        publish_names_change, sender, names_change(instance, deleted=True)
+    ))
+
+
+def update_user_auth_hash(sender, instance, raw=False, **kwargs):
+    """Отзывает выданные токены при изменении роли или флагов."""
+    if not raw:
+        update_auth_hash(instance)
+
+
+def revoke_user_auth_hash(sender, instance, **kwargs):
+    revoke_auth_hash(instance)
+
+
+def connect_signals():
+    for model in VERSIONED_MODELS:
+        post_save.connect(bump_model_version, sender=model)
+        post_delete.connect(bump_model_version, sender=model)
+    m2m_changed.connect(bump_title_version, sender=Title.genre.through)
+    post_save.connect(bump_rating_version, sender=Review)
+    post_delete.connect(bump_rating_version, sender=Review)
+    for model in NAMED_MODELS:
+        post_save.connect(publish_saved_name, sender=model)
+        post_delete.connect(publish_deleted_name, sender=model)
+    post_save.connect(update_user_auth_hash, sender=User)
+    post_delete.connect(revoke_user_auth_hash, sender=User)
@@ -0,0 +1,177 @@
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from reviews.models import Title
+from reviews.utils import normalize_search_key
+
+from .cache import NAMES_VERSION_KEY, VersionedIndex
+
+BUILD_CHUNK_SIZE = 10000
+SIMILARITY_THRESHOLD = 0.3
+# Доля устаревших документов, после которой списки сжимаются.
+COMPACT_RATIO = 0.25
+
+
+def word_trigrams(word):
+    padded = f'  {word} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def trigrams(key, word_cache=None):
+    """Триграммы ключа поиска, как в pg_trgm: слова дополнены пробелами.
+
+    При построении индекса триграммы слов берутся из `word_cache`:
+    слова в названиях повторяются.
+    """
+    grams = set()
+    for word in key.split():
+        if word_cache is None:
+            grams |= word_trigrams(word)
+            continue
+        cached = word_cache.get(word)
+        if cached is None:
+            cached = word_cache[word] = word_trigrams(word)
+        grams |= cached
+    return grams
+
+
+def grow(values, size):
+    """Удлиняет массив нулями, с запасом, чтобы не расти по одному."""
+    if len(values) < size:
+        extra = max(size, len(values) * 2) - len(values)
+        values.extend(array(values.typecode, bytes(extra * values.itemsize)))
+
+
+class TrigramIndex(VersionedIndex):
+    """Индекс триграмм названий произведений в памяти процесса.
+
+    Каждая проиндексированная версия названия - отдельный документ.
+    Списки документов триграмм хранятся в array('I'), поэтому индекс
+    на миллион названий занимает десятки мегабайт. При изменении
+    названия старый документ помечается удалённым, новый дописывается
+    в конец, а списки периодически сжимаются. Изменения других
+    процессов приходят через журнал названий в кеше.
+    """
+
+    models = (Title,)
+    version_key = NAMES_VERSION_KEY
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self.grams = {}
+        self.postings = []
+        self.doc_title = array('I', [0])
+        self.doc_size = array('B', [0])
+        self.title_doc = array('I')
+        self.dead = 0
+
+    def load(self):
+        self.clear()
+        titles = Title.objects.order_by('pk').values_list('pk', 'search_name')
+        word_cache = {}
+        for title_id, key in titles.iterator(chunk_size=BUILD_CHUNK_SIZE):
+            self.add(title_id, key, word_cache)
+
+    def add(self, title_id, key, word_cache=None):
+        grams = trigrams(key, word_cache)
+        doc = len(self.doc_title)
+        self.doc_title.append(title_id)
+        self.doc_size.append(min(len(grams), 255))
+        grow(self.title_doc, title_id + 1)
+        self.title_doc[title_id] = doc
+        for gram in grams:
+            index = self.grams.get(gram)
+            if index is None:
+                index = self.grams[gram] = len(self.postings)
+                self.postings.append(array('I'))
+            self.postings[index].append(doc)
+
+    def remove(self, title_id):
+        if title_id >= len(self.title_doc) or not self.title_doc[title_id]:
+            return
+        self.doc_title[self.title_doc[title_id]] = 0
+        self.title_doc[title_id] = 0
+        self.dead += 1
+        if self.dead > len(self.doc_title) * COMPACT_RATIO:
+            self.compact()
+
+    def compact(self):
+        """Убирает удалённые документы из списков и перенумеровывает."""
+        renumber = array('I', bytes(4 * len(self.doc_title)))
+        doc_title, doc_size = array('I', [0]), array('B', [0])
+        for doc in range(1, len(self.doc_title)):
+            title_id = self.doc_title[doc]
+            if title_id:
+                renumber[doc] = len(doc_title)
+                self.title_doc[title_id] = len(doc_title)
+                doc_title.append(title_id)
+                doc_size.append(self.doc_size[doc])
+        self.postings = [
+            array('I', [renumber[doc] for doc in posting if renumber[doc]])
+            for posting in self.postings
+        ]
+        self.doc_title, self.doc_size, self.dead = doc_title, doc_size, 0
+
+    def apply_change(self, model, change):
+        """Учитывает запись журнала: новое название или удаление."""
+        self.remove(change['pk'])
+        if change['key'] is not None:
+            self.add(change['pk'], change['key'])
+
+    def search(self, text, limit=10, threshold=SIMILARITY_THRESHOLD):
+        """Пары (id произведения, сходство) по убыванию сходства.
+
+        Сходство - доля общих триграмм (Жаккар), как в pg_trgm. Документ
+        со сходством не ниже порога делит с запросом не меньше `need`
+        триграмм, поэтому кандидаты собираются только из самых редких
+        `size - need + 1` списков. Длинные списки частых триграмм
+        (начала слов) не перебираются: принадлежность к ним кандидатов
+        проверяется двоичным поиском, списки отсортированы по номерам.
+        """
+        query = trigrams(normalize_search_key(text))
+        if not query:
+            return []
+        size = len(query)
+        need = max(math.ceil(threshold * size - 1e-9), 1)
+        with self.lock:
+            self.ensure_fresh()
+            postings = sorted(
+                (self.postings[self.grams[gram]] for gram in query
+                 if gram in self.grams),
+                key=len
+            )
+            split = size - need + 1
+            counts = Counter()
+            for posting in postings[:split]:
+                counts.update(posting)
+            common = postings[split:]
+            doc_title, doc_size = self.doc_title, self.doc_size
+            scored = []
+            for doc, count in counts.items():
+                if count + len(common) < need or not doc_title[doc]:
+                    continue
+                missing = len(common) - (need - count)
+                for posting in common:
+                    position = bisect_left(posting, doc)
+                    if position < len(posting) and posting[position] == doc:
+                        count += 1
+                    else:
+                        missing -= 1
+                        if missing < 0:
+                            break
+                if count < need:
+                    continue
+                similarity = count / (size + doc_size[doc] - count)
+                if similarity >= threshold:
+                    scored.append((similarity, -doc_title[doc]))
+            best = heapq.nlargest(limit, scored)
+        return [(-title_id, similarity) for similarity, title_id in best]
+
+
+title_index = TrigramIndex()
@@ -1,9 +1,10 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (CategoryViewSet, CommentViewSet, GenreViewSet,
-                    ReviewViewSet, TitleViewSet, UserCreateViewSet,
-                    UserReceiveTokenViewSet, UserViewSet)
+from .views import (AutocompleteView, CacheStatsView, CategoryViewSet,
+                    CommentViewSet, GenreViewSet, ModerationCommentViewSet,
+                    ModerationReviewViewSet, ReviewViewSet, TitleViewSet,
+                    UserCreateViewSet, UserReceiveTokenViewSet, UserViewSet)
 
 router_api_v1 = DefaultRouter()
 router_api_v1.register('users', UserViewSet, basename='users')
@@ -18,6 +19,14 @@ router_api_v1.register(
     CommentViewSet,
     basename='comments'
 )
+router_api_v1.register(
+    'moderation/reviews', ModerationReviewViewSet,
+    basename='moderation-reviews'
+)
+router_api_v1.register(
+    'moderation/comments', ModerationCommentViewSet,
+    basename='moderation-comments'
+)
 
 auth_urls = [
     path(
@@ -35,5 +44,9 @@ auth_urls = [
 
 urlpatterns = [
     path('v1/auth/', include(auth_urls)),
+    path('v1/cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path(
+        'v1/autocomplete/', AutocompleteView.as_view(), name='autocomplete'
+    ),
     path('v1/', include(router_api_v1.urls))
 ]
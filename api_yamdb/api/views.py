@@ -1,25 +1,37 @@
 from django.contrib.auth.tokens import default_token_generator
-from django.db.models import Avg
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status, mixins, viewsets, filters
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework.views import APIView
 
 from .email import send_confirmation_code
-from .filters import TitleFilter
-from .mixins import CreateListDestroyViewSet
-from .permissions import (IsSuperuserAdminModeratorAuthorPermission,
+from .filters import (CommentModerationFilter, FullTextSearchFilter,
+                      ReviewModerationFilter, SearchKeyFilter, TitleFilter)
+from .authentication import access_token_for, get_user_instance
+from .autocomplete import TOP_N, autocomplete_index
+from .cache import cache_stats
+from .mixins import (CachedResponseMixin, ConditionalGetMixin,
+                     CreateListDestroyViewSet, NestedParentMixin,
+                     SerializerProjectionMixin)
+from .permissions import (IsModeratorOrAdminPermission,
+                          IsSuperuserAdminModeratorAuthorPermission,
                           IsSuperuserOrAdminPermission, ReadOnlyPermission)
 from .serializers import (CategorySerializer, CommentSerializer,
-                          GenreSerializer, ReviewSerializer, SignUpSerializer,
-                          TitleGetSerializer, TitleSerializer, TokenSerializer,
-                          UserSerializer)
-from reviews.models import Category, Genre, Review, Title
+                          GenreSerializer, ModerationCommentSerializer,
+                          ModerationReviewSerializer, ReviewSerializer,
+                          SignUpSerializer, TitleFuzzySerializer,
+                          TitleGetSerializer, TitleRatingSerializer,
+                          TitleSerializer, TokenSerializer, UserSerializer)
+from .trigram import title_index
+from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
 from users.models import User
 
+FUZZY_LIMIT = 10
+FUZZY_MAX_LIMIT = 50
+
 
 class UserCreateViewSet(mixins.CreateModelMixin,
                         viewsets.GenericViewSet):
@@ -67,11 +79,12 @@ class UserReceiveTokenViewSet(mixins.CreateModelMixin,
         if not default_token_generator.check_token(user, confirmation_code):
             message = {'confirmation_code': 'Код подтверждения невалиден'}
             return Response(message, status=status.HTTP_400_BAD_REQUEST)
-        message = {'token': str(AccessToken.for_user(user))}
+        message = {'token': str(access_token_for(user))}
         return Response(message, status=status.HTTP_200_OK)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalGetMixin, SerializerProjectionMixin,
+                  viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (
@@ -80,8 +93,9 @@ class UserViewSet(viewsets.ModelViewSet):
         IsSuperuserAdminModeratorAuthorPermission
     )
     lookup_field = 'username'
-    search_fields = ('username',)
-    filter_backends = (filters.SearchFilter,)
+    search_fields = ('search_username',)
+    cache_models = (User,)
+    filter_backends = (SearchKeyFilter,)
     http_method_names = ['get', 'post', 'head', 'patch', 'delete']
 
     @action(
@@ -92,10 +106,10 @@ class UserViewSet(viewsets.ModelViewSet):
         url_name='me'
     )
     def get_user_info(self, request):
+        user = get_user_instance(self.request.user)
         if request.method == 'GET':
-            serializer = self.get_serializer(self.request.user)
+            serializer = self.get_serializer(user)
         else:
-            user = self.request.user
             serializer = UserSerializer(user, data=request.data, partial=True)
             serializer.is_valid(raise_exception=True)
             if serializer.validated_data.get('role'):
@@ -104,25 +118,66 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class CacheStatsView(APIView):
+    """Счётчики попаданий и промахов кеша ответов."""
+
+    permission_classes = (IsSuperuserOrAdminPermission,)
+
+    def get(self, request):
+        return Response(cache_stats(), status=status.HTTP_200_OK)
+
+
+class AutocompleteView(APIView):
+    """Подсказки по началу названия произведения, жанра или категории.
+
+    Ответ строится по индексу в памяти без запросов к базе данных.
+    """
+
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', TOP_N))
+        except ValueError:
+            limit = TOP_N
+        return Response(
+            autocomplete_index.search(
+                request.query_params.get('q', ''), max(limit, 1)
+            ),
+            status=status.HTTP_200_OK
+        )
+
+
 class CategoryViewSet(CreateListDestroyViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    cache_models = (Category,)
 
 
 class GenreViewSet(CreateListDestroyViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    cache_models = (Genre,)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.annotate(
-        rating=Avg('reviews__score')).order_by('name')
+class TitleViewSet(ConditionalGetMixin, CachedResponseMixin,
+                   SerializerProjectionMixin, viewsets.ModelViewSet):
+    queryset = Title.objects.order_by('name')
     serializer_class = TitleSerializer
     permission_classes = (ReadOnlyPermission | IsSuperuserOrAdminPermission,)
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (
+        DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter
+    )
     filterset_class = TitleFilter
+    ordering_fields = ('name', 'year', 'rating')
+    cursor_ordering = ('name', 'id')
+    cache_models = (Category, Genre, Title, GenreTitle, Review)
 
     def get_serializer_class(self):
+        if self.action == 'get_rating':
+            return TitleRatingSerializer
+        if self.action == 'fuzzy':
+            return TitleFuzzySerializer
         if self.request.method in permissions.SAFE_METHODS:
             return TitleGetSerializer
         else:
@@ -134,20 +189,73 @@ class TitleViewSet(viewsets.ModelViewSet):
         self.perform_create(serializer)
         return Response((serializer.data), status=status.HTTP_201_CREATED)
 
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    @action(
+        detail=True,
+        methods=['GET'],
+        url_path='rating',
+        url_name='rating'
+    )
+    def get_rating(self, request, pk=None):
+        """Возвращает распределение оценок произведения."""
+        serializer = self.get_serializer(self.get_object())
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        url_path='fuzzy',
+        url_name='fuzzy'
+    )
+    def fuzzy(self, request):
+        """Поиск произведений по названию с опечатками.
+
+        Кандидаты берутся из индекса триграмм в памяти, из базы читаются
+        только названия найденных произведений.
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', FUZZY_LIMIT)),
+                        FUZZY_MAX_LIMIT)
+        except ValueError:
+            limit = FUZZY_LIMIT
+        matches = title_index.search(
+            request.query_params.get('q', ''), max(limit, 1)
+        )
+        names = dict(Title.objects.filter(
+            pk__in=[title_id for title_id, _ in matches]
+        ).values_list('pk', 'name'))
+        serializer = self.get_serializer([
+            {'id': title_id, 'name': names[title_id],
+             'similarity': round(similarity, 3)}
+            for title_id, similarity in matches if title_id in names
+        ], many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ConditionalGetMixin, NestedParentMixin,
+                    SerializerProjectionMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = (
         permissions.IsAuthenticatedOrReadOnly,
         IsSuperuserAdminModeratorAuthorPermission
     )
+    cursor_ordering = ('-pub_date', '-id')
+    cache_models = (Review, User)
 
     def get_title(self):
-        title_id = self.kwargs.get('title_id')
-        return get_object_or_404(Title, pk=title_id)
+        return self.get_parent(
+            Title.objects.only('pk'), pk=self.kwargs.get('title_id')
+        )
+
+    def get_parent_object(self):
+        return self.get_title()
 
     def get_queryset(self):
-        return self.get_title().reviews.all()
+        return Review.objects.filter(title_id=self.kwargs.get('title_id'))
 
     def perform_create(self, serializer):
         serializer.save(
@@ -155,25 +263,64 @@ class ReviewViewSet(viewsets.ModelViewSet):
         )
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ConditionalGetMixin, NestedParentMixin,
+                     SerializerProjectionMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = (
         permissions.IsAuthenticatedOrReadOnly,
         IsSuperuserAdminModeratorAuthorPermission,
     )
+    cursor_ordering = ('-pub_date', '-id')
+    cache_models = (Comment, User)
 
     def get_review(self):
-        review_id = self.kwargs.get('review_id')
-        title_id = self.kwargs.get('title_id')
-        return get_object_or_404(Review,
-                                 pk=review_id,
-                                 title_id=title_id)
+        return self.get_parent(
+            Review.objects.only('pk', 'title_id'),
+            pk=self.kwargs.get('review_id'),
+            title_id=self.kwargs.get('title_id')
+        )
+
+    def get_parent_object(self):
+        return self.get_review()
 
     def get_queryset(self):
-        return self.get_review().comments.all()
+        return Comment.objects.filter(
+            review_id=self.kwargs.get('review_id'),
+            review__title_id=self.kwargs.get('title_id')
+        )
 
     def perform_create(self, serializer):
         serializer.save(
             author=self.request.user,
             review=self.get_review()
         )
+
+
+class ModerationReviewViewSet(ConditionalGetMixin, SerializerProjectionMixin,
+                              viewsets.ReadOnlyModelViewSet):
+    """Поиск отзывов по тексту для модераторов.
+
+    `?search=` ищет по полнотекстовому индексу, фильтры `author`,
+    `title` и `pub_date_after`/`pub_date_before` сужают выборку.
+    """
+
+    queryset = Review.objects.all()
+    serializer_class = ModerationReviewSerializer
+    permission_classes = (IsModeratorOrAdminPermission,)
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter)
+    filterset_class = ReviewModerationFilter
+    cursor_ordering = ('-pub_date', '-id')
+    cache_models = (Review, User)
+
+
+class ModerationCommentViewSet(ConditionalGetMixin, SerializerProjectionMixin,
+                               viewsets.ReadOnlyModelViewSet):
+    """Поиск комментариев по тексту для модераторов."""
+
+    queryset = Comment.objects.all()
+    serializer_class = ModerationCommentSerializer
+    permission_classes = (IsModeratorOrAdminPermission,)
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter)
+    filterset_class = CommentModerationFilter
+    cursor_ordering = ('-pub_date', '-id')
+    cache_models = (Comment, Review, User)
@@ -72,6 +72,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Файловая тестовая база: в общей базе в памяти потоки не ждут
+        # блокировку записи, а падают с ошибкой.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -111,20 +114,39 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 STATICFILES_DIRS = ((BASE_DIR / 'static/'),)
-CSV_FILES = os.path.join(BASE_DIR, 'static/data')
+CSV_FILES = os.getenv('CSV_FILES', os.path.join(BASE_DIR, 'static/data'))
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.StatelessJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.'
-                                'PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.'
+                                'PageNumberOrKeysetPagination',
     'PAGE_SIZE': 4,
 }
 
+# Версии данных, отпечатки прав и ответы API хранятся в кеше, поэтому все
+# процессы сервера должны использовать общий бэкенд с атомарным incr(),
+# например memcached или redis. Кеш в памяти процесса подходит только для
+# разработки с одним процессом; без DEBUG его отклоняет проверка api.E001.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+API_CACHE_TIMEOUT = 60 * 60 * 24
+API_AUTH_HASH_TIMEOUT = 60
+API_ESTIMATED_COUNT_LIMIT = 1000
+# Сколько хранятся записи журнала изменений названий для индексов.
+API_NAMES_CHANGE_TIMEOUT = 60 * 60
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=7),
     'AUTH_HEADER_TYPES': ('Bearer',),
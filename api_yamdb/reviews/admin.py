@@ -1,6 +1,23 @@
 from django.contrib import admin
 
-from . models import Category, Genre, Title, Review, Comment
+from . fts import fts_filter
+from . models import Category, Genre, GenreTitle, Title, Review, Comment
+
+
+class FullTextSearchMixin:
+    """Поиск по тексту идёт через полнотекстовый индекс модели.
+
+    Совпадения по `search_fields` добавляются к найденным в индексе.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        found, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        condition = fts_filter(self.model, search_term)
+        if condition is None:
+            return found, may_have_duplicates
+        return queryset.filter(condition) | found, may_have_duplicates
 
 
 class CategoryAdmin(admin.ModelAdmin):
@@ -17,23 +34,31 @@ class GenreAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class GenreTitleInline(admin.TabularInline):
+    model = GenreTitle
+    extra = 1
+
+
 class TitleAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'name', 'year', 'description', 'category')
+    inlines = (GenreTitleInline,)
+    list_display = (
+        'pk', 'name', 'year', 'description', 'category', 'rating'
+    )
     search_fields = ('name', 'year')
     list_filter = ('name', 'year', 'genre', 'category')
     empty_value_display = '-пусто-'
 
 
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'author', 'score', 'pub_date', 'title')
-    search_fields = ('author',)
+    search_fields = ('author__username',)
     list_filter = ('author', 'score', 'pub_date')
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'author', 'pub_date', 'review')
-    search_fields = ('author', 'text')
+    search_fields = ('author__username',)
     list_filter = ('author', 'pub_date')
     empty_value_display = '-пусто-'
 
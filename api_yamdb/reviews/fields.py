@@ -0,0 +1,38 @@
+import struct
+
+from django.db import models
+
+SCORE_BUCKETS = 10
+
+
+class ScoreHistogramField(models.BinaryField):
+    """Хранит счётчики оценок 1..10 компактным массивом uint32."""
+
+    description = 'Гистограмма оценок произведения'
+    packer = struct.Struct(f'<{SCORE_BUCKETS}I')
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default', empty_histogram)
+        super().__init__(*args, **kwargs)
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, list):
+            return value
+        if isinstance(value, str):
+            return [int(count) for count in value.split(',')]
+        return list(self.packer.unpack(bytes(value)))
+
+    def get_prep_value(self, value):
+        if isinstance(value, (list, tuple)):
+            value = self.packer.pack(*value)
+        return super().get_prep_value(value)
+
+    def value_to_string(self, obj):
+        return ','.join(map(str, self.value_from_object(obj)))
+
+
+def empty_histogram():
+    return [0] * SCORE_BUCKETS
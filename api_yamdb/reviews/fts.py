@@ -0,0 +1,163 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+MAX_TERMS = 10
+TERM_RE = re.compile(r'\w+')
+
+# Таблица модели -> (индексируемые колонки, веса колонок для bm25).
+# Совпадение в названии произведения весит больше, чем в описании.
+FTS_INDEXES = {
+    'reviews_title': (('name', 'description'), (10.0, 1.0)),
+    'reviews_review': (('text',), (1.0,)),
+    'reviews_comment': (('text',), (1.0,)),
+}
+TITLE_TABLE = 'reviews_title'
+REVIEW_TABLE = 'reviews_review'
+COMMENT_TABLE = 'reviews_comment'
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def fts_triggers(table):
+    """Триггеры, поддерживающие индекс при изменении таблицы.
+
+    SQLite пересоздаёт таблицу при изменении её схемы и удаляет триггеры,
+    поэтому такие миграции должны создавать их заново.
+    """
+    columns, _ = FTS_INDEXES[table]
+    index = fts_table(table)
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    insert = (
+        f'INSERT INTO {index}(rowid, {names}) VALUES (new.id, {new});'
+    )
+    delete = (
+        f'INSERT INTO {index}({index}, rowid, {names}) '
+        f"VALUES ('delete', old.id, {old});"
+    )
+    return (
+        f'CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} '
+        f'BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} '
+        f'BEGIN {delete} END',
+        # Остальные колонки, например рейтинг, меняются чаще текста и
+        # не должны переписывать индекс.
+        f'CREATE TRIGGER IF NOT EXISTS {index}_au '
+        f'AFTER UPDATE OF {names} ON {table} BEGIN {delete} {insert} END',
+    )
+
+
+def fts_create(table):
+    columns, _ = FTS_INDEXES[table]
+    return (
+        f'CREATE VIRTUAL TABLE {fts_table(table)} USING fts5('
+        f"{', '.join(columns)}, content='{table}', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')",
+    ) + fts_triggers(table)
+
+
+def fts_drop(table):
+    index = fts_table(table)
+    return (
+        f'DROP TRIGGER IF EXISTS {index}_au',
+        f'DROP TRIGGER IF EXISTS {index}_ad',
+        f'DROP TRIGGER IF EXISTS {index}_ai',
+        f'DROP TABLE IF EXISTS {index}',
+    )
+
+
+TITLE_FTS_TRIGGERS = fts_triggers(TITLE_TABLE)
+CREATE_TITLE_FTS = fts_create(TITLE_TABLE)
+DROP_TITLE_FTS = fts_drop(TITLE_TABLE)
+
+
+def fts_supported(db_connection=connection):
+    return db_connection.vendor == 'sqlite'
+
+
+def search_terms(text):
+    """Слова поискового запроса без операторов и спецсимволов."""
+    return TERM_RE.findall(text or '')[:MAX_TERMS]
+
+
+def match_query(text, columns=None):
+    """Запрос FTS5: все слова запроса как префиксы в кавычках.
+
+    Кавычки не дают пользовательскому вводу стать синтаксисом FTS5
+    (`OR`, `NEAR`, `*`, `:`). Если заданы columns, слова ищутся только
+    в этих колонках.
+    """
+    query = ' '.join(f'"{term}"*' for term in search_terms(text))
+    if columns:
+        return f"{{{' '.join(columns)}}} : ({query})"
+    return query
+
+
+def rebuild_fts_index(table, db_connection=connection):
+    """Перестраивает индекс целиком, например после загрузки без триггеров."""
+    if not fts_supported(db_connection):
+        return
+    index = fts_table(table)
+    with db_connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+
+def substring_filter(table, terms, columns=None):
+    """Запасной вариант для СУБД без FTS5: все слова как подстроки."""
+    columns = columns or FTS_INDEXES[table][0]
+    condition = Q()
+    for term in terms:
+        term_condition = Q()
+        for column in columns:
+            term_condition |= Q(**{f'{column}__icontains': term})
+        condition &= term_condition
+    return condition
+
+
+def fts_filter(model, text, columns=None):
+    """Условие «запись содержит слова запроса» для сочетания с другими.
+
+    Слова ищутся в колонках columns или во всех индексируемых колонках.
+    Возвращает None, если в запросе нет слов.
+    """
+    table = model._meta.db_table
+    terms = search_terms(text)
+    if not terms:
+        return None
+    if not fts_supported():
+        return substring_filter(table, terms, columns)
+    index = fts_table(table)
+    return Q(pk__in=RawSQL(
+        f'SELECT rowid FROM {index} WHERE {index} MATCH %s',
+        (match_query(text, columns),)
+    ))
+
+
+def search_fts(queryset, text):
+    """Отбирает записи по словам запроса, лучшие совпадения первыми.
+
+    На SQLite запрос идёт в индекс FTS5 и сортируется по bm25, на других
+    СУБД используется поиск подстрок без ранжирования. Запрос без слов,
+    как и в SearchFilter, не фильтрует записи.
+    """
+    table = queryset.model._meta.db_table
+    terms = search_terms(text)
+    if not terms:
+        return queryset
+    if not fts_supported():
+        return queryset.filter(substring_filter(table, terms))
+    index = fts_table(table)
+    _, weights = FTS_INDEXES[table]
+    rank = f"bm25({index}, {', '.join(map(str, weights))})"
+    return queryset.extra(
+        tables=[index],
+        where=[f'{index}.rowid = {table}.id', f'{index} MATCH %s'],
+        params=[match_query(text)],
+        select={'search_rank': rank},
+    ).order_by('search_rank', 'pk')
@@ -1,20 +1,57 @@
 import csv
+import gzip
+import hashlib
+import json
 import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import chain, islice, repeat
 
-from django.core.management import BaseCommand
-from django.db import IntegrityError
+import django
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.core.management.color import no_style
+from django.db import (IntegrityError, connection, connections, models,
+                       transaction)
+from django.utils.dateparse import parse_datetime
 
-from api_yamdb.settings import CSV_FILES
+from api.authentication import reset_auth_hashes
+from api.cache import bump_names_version, bump_version
+from reviews.fts import FTS_INDEXES, rebuild_fts_index
 from reviews.models import (
     Category,
     Comment,
     Genre,
     GenreTitle,
+    ImportCheckpoint,
+    ImportDeferredSchema,
+    ImportRowHash,
     Review,
     Title
 )
+from reviews.rating import recalculate_ratings
+from reviews.utils import SearchKeyMixin
 from users.models import User
 
+BATCH_SIZE = 1000
+FILE_EXTENSIONS = ('.csv', '.csv.gz', '.ndjson', '.ndjson.gz')
+REPORT_ROWS = 5
+FAST_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'OFF',
+    'cache_size': -256 * 1024,
+    'temp_store': 'MEMORY',
+}
+SCHEMA_RESTORED = (
+    'Индексы и триггеры, удалённые прерванной загрузкой --fast, '
+    'восстановлены.'
+)
+
 FILES_CLASSES = {
     'category': Category,
     'genre': Genre,
@@ -34,52 +71,932 @@ FIELDS = {
 }
 
 
+_worker_known_ids = None
+
+
+class KnownIds(dict):
+    """Идентификаторы записей, на которые могут ссылаться строки файлов.
+
+    Множество для модели загружается из базы одним запросом при первом
+    обращении.
+    """
+
+    def __missing__(self, model):
+        ids = self[model] = set(model.objects.values_list('pk', flat=True))
+        return ids
+
+
+@contextmanager
 def open_csv_file(file_name):
-    """Менеджер контекста для открытия csv-файлов."""
-    csv_file = file_name + '.csv'
-    csv_path = os.path.join(CSV_FILES, csv_file)
-    try:
-        with (open(csv_path, encoding='utf-8')) as file:
-            return list(csv.reader(file))
-    except FileNotFoundError:
-        print(f'Файл {csv_file} не найден.')
+    """Менеджер контекста для открытия csv-файлов.
+
+    Кроме `<имя>.csv` ищутся файлы NDJSON и варианты, сжатые gzip.
+    """
+    for extension in FILE_EXTENSIONS:
+        csv_path = os.path.join(settings.CSV_FILES, file_name + extension)
+        if os.path.exists(csv_path):
+            break
+    else:
+        print(f'Файл {file_name}.csv не найден.')
+        yield None
         return
+    opener = gzip.open if csv_path.endswith('.gz') else open
+    with opener(csv_path, 'rt', encoding='utf-8', newline='') as file:
+        yield file
+
+
+def read_csv(file):
+    """Возвращает заголовок и генератор строк csv-файла.
+
+    Строки читаются по одной, файл не загружается в память целиком.
+    """
+    reader = csv.reader(file)
+    header = next(reader, [])
+    return header, (dict(zip(header, row)) for row in reader)
+
 
+def read_ndjson(file):
+    """Возвращает заголовок и генератор строк файла NDJSON."""
+    lines = (line for line in file if line.strip())
+    first = next(lines, None)
+    if first is None:
+        return [], iter(())
+    first = json.loads(first)
+    return list(first), chain([first], map(json.loads, lines))
 
-def change_foreign_values(data_csv):
-    """Изменяет значения."""
+
+def read_rows(file):
+    if '.ndjson' in os.path.basename(file.name):
+        return read_ndjson(file)
+    return read_csv(file)
+
+
+@contextmanager
+def keep_file_dates(model, header):
+    """Не даёт auto_now_add заменить даты, взятые из файла."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False) and field.name in header
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def change_foreign_values(data_csv, known_ids):
+    """Заменяет значения внешних ключей на идентификаторы `*_id`."""
     data_csv_copy = data_csv.copy()
     for field_key, field_value in data_csv.items():
-        if field_key in FIELDS.keys():
-            field_key0 = FIELDS[field_key][0]
-            data_csv_copy[field_key0] = FIELDS[field_key][1].objects.get(
-                pk=field_value)
+        if field_key not in FIELDS:
+            continue
+        field_name, model = FIELDS[field_key]
+        del data_csv_copy[field_key]
+        if field_value in ('', None):
+            data_csv_copy[f'{field_name}_id'] = None
+            continue
+        value = int(field_value)
+        if value not in known_ids[model]:
+            raise ValueError(
+                f'{model.__qualname__} с id={value} не существует'
+            )
+        data_csv_copy[f'{field_name}_id'] = value
     return data_csv_copy
 
 
-def load_csv(file_name, class_name):
-    """Осуществляет загрузку csv-файлов."""
-    table_not_loaded = f'Таблица {class_name.__qualname__} не загружена.'
-    table_loaded = f'Таблица {class_name.__qualname__} загружена.'
-    data = open_csv_file(file_name)
-    rows = data[1:]
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def change_empty_values(data_csv, nullable):
+    """Пустые значения полей, допускающих NULL, заменяет на None."""
+    return {
+        key: None if value == '' and key in nullable else value
+        for key, value in data_csv.items()
+    }
+
+
+def build_objects(rows, model, known_ids):
+    nullable = {
+        field.name for field in model._meta.concrete_fields if field.null
+    }
+    search_keys = issubclass(model, SearchKeyMixin)
     for row in rows:
-        data_csv = dict(zip(data[0], row))
-        data_csv = change_foreign_values(data_csv)
+        obj = model(**change_foreign_values(
+            change_empty_values(row, nullable), known_ids
+        ))
+        if search_keys:
+            obj.update_search_keys()
+        yield obj
+
+
+def related_models(model):
+    """Модели, на которые ссылаются внешние ключи модели."""
+    return {
+        field.related_model for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model is not model
+    }
+
+
+def dependency_levels(files_classes):
+    """Разбивает таблицы на уровни по графу внешних ключей моделей.
+
+    Таблицы одного уровня не зависят друг от друга, а все таблицы,
+    на которые они ссылаются, находятся на предыдущих уровнях.
+    """
+    keys = {model: key for key, model in files_classes.items()}
+    dependencies = {
+        key: {
+            keys[related] for related in related_models(model)
+            if related in keys
+        }
+        for key, model in files_classes.items()
+    }
+    levels, done = [], set()
+    while len(done) < len(dependencies):
+        level = [
+            key for key, required in dependencies.items()
+            if key not in done and required <= done
+        ]
+        if not level:
+            raise CommandError('Циклическая зависимость между таблицами.')
+        levels.append(level)
+        done.update(level)
+    return levels
+
+
+def init_worker(known_ids=None):
+    global _worker_known_ids
+    django.setup()
+    _worker_known_ids = known_ids
+
+
+def build_batch(model, rows):
+    return list(build_objects(rows, model, _worker_known_ids))
+
+
+def parallel_batches(rows, model, known_ids, batch_size, workers):
+    """Разбирает пакеты строк в процессах-обработчиках.
+
+    Файл читается последовательно, так как поля в кавычках могут
+    содержать переводы строк. Очередь ограничена, чтобы не читать файл
+    быстрее, чем пакеты записываются в базу.
+    """
+    ids = {related: known_ids[related] for related in related_models(model)}
+    with ProcessPoolExecutor(
+            workers, initializer=init_worker, initargs=(ids,)) as executor:
+        pending = deque()
+        for batch in batched(rows, batch_size):
+            pending.append(executor.submit(build_batch, model, batch))
+            if len(pending) > workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def reset_sequences(models):
+    """Сдвигает счётчики первичных ключей после вставки с явными id."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def make_batches(rows, model, known_ids, batch_size, workers):
+    if workers > 1:
+        return parallel_batches(rows, model, known_ids, batch_size, workers)
+    return batched(build_objects(rows, model, known_ids), batch_size)
+
+
+def get_checkpoint(table, path):
+    """Возвращает контрольную точку таблицы или None, если её не грузить."""
+    file = os.path.basename(path)
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+        table=table, defaults={'file': file}
+    )
+    if checkpoint.completed:
+        print(f'Таблица {table} уже загружена. '
+              'Для повторной загрузки используйте --restart.')
+        return None
+    if checkpoint.row and checkpoint.file != file:
+        print(f'Контрольная точка таблицы {table} относится к файлу '
+              f'{checkpoint.file}. Используйте --restart.')
+        return None
+    checkpoint.file = file
+    return checkpoint
+
+
+def write_batches(batches, model, checkpoint):
+    """Записывает пакеты, сохраняя контрольную точку в той же транзакции."""
+    for batch in batches:
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+            ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                file=checkpoint.file,
+                row=checkpoint.row + len(batch),
+                batch=checkpoint.batch + 1,
+                processed=False
+            )
+        checkpoint.row += len(batch)
+        checkpoint.batch += 1
+
+
+def check_batches(batches, model, header, known_ids):
+    """Проверяет строки без записи в базу и возвращает их количество.
+
+    Идентификаторы проверенных строк добавляются к известным, чтобы
+    ссылки на них из следующих таблиц считались корректными.
+    """
+    exclude = [
+        field.name for field in model._meta.concrete_fields
+        if field.is_relation or field.attname not in header
+    ]
+    ids = known_ids[model]
+    count = 0
+    for batch in batches:
+        for obj in batch:
+            obj.clean_fields(exclude=exclude)
+            ids.add(obj.pk)
+        count += len(batch)
+    return count
+
+
+def load_csv(file_name, class_name, known_ids, batch_size=BATCH_SIZE,
+             workers=1, dry_run=False):
+    """Загружает csv-файл пакетами bulk_create.
+
+    Строки проходят конвейер генераторов: чтение, подстановка внешних
+    ключей, нарезка на пакеты и вставка, поэтому в памяти находится не
+    больше нескольких пакетов. При workers > 1 пакеты разбираются
+    в отдельных процессах. Каждый пакет записывается вместе с контрольной
+    точкой таблицы, и повторный запуск продолжает загрузку после
+    последнего записанного пакета. В режиме dry_run строки только
+    проверяются. Возвращает количество загруженных строк.
+    """
+    name = class_name.__qualname__
+    with open_csv_file(file_name) as file:
+        if file is None:
+            return 0
+        checkpoint = None
+        if not dry_run:
+            checkpoint = get_checkpoint(file_name, file.name)
+            if checkpoint is None:
+                return 0
+        resumed_from = checkpoint.row if checkpoint else 0
+        header, rows = read_rows(file)
+        if resumed_from:
+            print(f'Продолжение загрузки со строки {resumed_from + 1}.')
+            rows = islice(rows, resumed_from, None)
+        batches = make_batches(rows, class_name, known_ids, batch_size,
+                               workers)
+        start = time.monotonic()
         try:
-            table = class_name(**data_csv)
-            table.save()
+            with keep_file_dates(class_name, header):
+                if dry_run:
+                    count = check_batches(
+                        batches, class_name, header, known_ids
+                    )
+                else:
+                    write_batches(batches, class_name, checkpoint)
+        except (ValueError, ValidationError, IntegrityError) as error:
+            row = checkpoint.row if checkpoint else 0
+            print(f'Ошибка в загружаемых данных. {error}. '
+                  f'Таблица {name} загружена до строки {row}.')
+            return row - resumed_from
+    if not dry_run:
+        checkpoint.completed = True
+        checkpoint.save(update_fields=('completed', 'updated'))
+        count = checkpoint.row - resumed_from
+        # Идентификаторы загруженной таблицы перечитываются при обращении.
+        known_ids.pop(class_name, None)
+    elapsed = time.monotonic() - start
+    rate = count / elapsed if elapsed else count
+    action = 'проверена' if dry_run else 'загружена'
+    print(
+        f'Таблица {name} {action}: '
+        f'{count} строк за {elapsed:.2f} с ({rate:.0f} строк/с).'
+    )
+    return count
+
+
+def row_hash(row):
+    return hashlib.blake2b(
+        repr(sorted(row.items())).encode(), digest_size=16
+    ).hexdigest()
+
+
+def csv_fields(header, model):
+    """Имена полей модели, которые заполняются из колонок файла.
+
+    Ключи поиска добавляются вместе с их исходными полями.
+    """
+    fields = [
+        FIELDS[column][0] if column in FIELDS else column
+        for column in header if column != 'id'
+    ]
+    return fields + [
+        key_field
+        for key_field, source in getattr(model, 'search_keys', {}).items()
+        if source in fields
+    ]
+
+
+def rated_titles(model, pks):
+    """Произведения, рейтинг которых зависит от записей модели."""
+    if model is not Review:
+        return set()
+    return set(Review.objects.filter(pk__in=pks).values_list(
+        'title_id', flat=True
+    ))
+
+
+def sync_batch(rows, model, table, stored, known_ids, fields, stats,
+               dry_run=False, titles=None):
+    """Записывает новые и изменённые строки пакета.
+
+    Из `stored` удаляются хеши встреченных строк, поэтому после чтения
+    файла в нём остаются только исчезнувшие строки. В режиме dry_run
+    изменения только подсчитываются, а идентификаторы новых строк
+    добавляются к известным для проверки ссылок следующих таблиц.
+    В `titles` добавляются произведения изменённых отзывов, прежние и
+    новые.
+    """
+    changed = {}
+    for row in rows:
+        digest = row_hash(row)
+        if stored.pop(int(row['id']), None) == digest:
+            stats['unchanged'] += 1
+        else:
+            changed[int(row['id'])] = (row, digest)
+    if not changed:
+        return set()
+    objs = dict(zip(changed, build_objects(
+        (row for row, _ in changed.values()), model, known_ids
+    )))
+    if dry_run:
+        existing = set(model.objects.filter(
+            pk__in=objs
+        ).values_list('pk', flat=True))
+        known_ids[model].update(objs)
+        stats['created'] += len(objs) - len(existing)
+        stats['updated'] += len(existing)
+        return existing
+    with transaction.atomic():
+        existing = set(model.objects.filter(
+            pk__in=objs
+        ).values_list('pk', flat=True))
+        if titles is not None and model is Review:
+            titles |= rated_titles(model, existing)
+            titles.update(obj.title_id for obj in objs.values())
+        model.objects.bulk_create(
+            obj for pk, obj in objs.items() if pk not in existing
+        )
+        if existing and fields:
+            model.objects.bulk_update(
+                [objs[pk] for pk in existing], fields
+            )
+        ImportRowHash.objects.filter(table=table, row_id__in=objs).delete()
+        ImportRowHash.objects.bulk_create(
+            ImportRowHash(table=table, row_id=pk, hash=digest)
+            for pk, (_, digest) in changed.items()
+        )
+    stats['created'] += len(objs) - len(existing)
+    stats['updated'] += len(existing)
+    return existing
+
+
+def delete_vanished(model, table, row_ids, batch_size, stats,
+                    dry_run=False, titles=None):
+    if dry_run:
+        stats['deleted'] += len(row_ids)
+        return
+    for batch in batched(row_ids, batch_size):
+        with transaction.atomic():
+            if titles is not None:
+                titles |= rated_titles(model, batch)
+            model.objects.filter(pk__in=batch).delete()
+            ImportRowHash.objects.filter(
+                table=table, row_id__in=batch
+            ).delete()
+        stats['deleted'] += len(batch)
+
+
+def sync_csv(file_name, class_name, known_ids, batch_size=BATCH_SIZE,
+             dry_run=False, titles=None):
+    """Приводит таблицу в соответствие с полным снимком из csv-файла.
+
+    Хеш каждой строки сравнивается с сохранённым при прошлой загрузке:
+    новые и изменённые строки записываются, строки, исчезнувшие из
+    снимка, удаляются. Записи таблицы без хеша, например после обычной
+    загрузки, считаются изменёнными, если есть в снимке, и удаляются,
+    если их там нет. В режиме dry_run база не изменяется. Идентификаторы
+    произведений, чей рейтинг затронут изменениями отзывов, добавляются
+    в `titles`. Возвращает счётчики изменений и идентификаторы изменённых
+    или удалённых записей.
+    """
+    stats, touched = Counter(), set()
+    with open_csv_file(file_name) as file:
+        if file is None:
+            return stats, touched
+        header, rows = read_rows(file)
+        fields = csv_fields(header, class_name)
+        stored = dict.fromkeys(
+            class_name.objects.values_list('pk', flat=True).iterator()
+        )
+        stored.update(
+            (row_id, digest) for row_id, digest
+            in ImportRowHash.objects.filter(
+                table=file_name
+            ).values_list('row_id', 'hash').iterator()
+            if row_id in stored
+        )
+        try:
+            with keep_file_dates(class_name, header):
+                for batch in batched(rows, batch_size):
+                    touched |= sync_batch(batch, class_name, file_name,
+                                          stored, known_ids, fields, stats,
+                                          dry_run, titles)
         except (ValueError, IntegrityError) as error:
             print(f'Ошибка в загружаемых данных. {error}. '
-                  f'{table_not_loaded}')
-            break
-    print(table_loaded)
+                  f'Таблица {class_name.__qualname__} обновлена частично.')
+            stats['failed'] += 1
+            return stats, touched
+    touched |= set(stored)
+    delete_vanished(class_name, file_name, list(stored), batch_size, stats,
+                    dry_run, titles)
+    if dry_run:
+        known_ids[class_name].difference_update(stored)
+    else:
+        known_ids.pop(class_name, None)
+    return stats, touched
+
+
+def table_names(models):
+    tables = set()
+    for model in models:
+        tables.add(model._meta.db_table)
+        tables.update(
+            field.remote_field.through._meta.db_table
+            for field in model._meta.local_many_to_many
+        )
+    return sorted(tables)
+
+
+def restore_deferred_schema():
+    """Создаёт заново объекты схемы, удалённые режимом --fast.
+
+    Вызывается в начале каждого запуска: если прошлая загрузка была
+    прервана, её индексы, триггеры и режим журнала остались только в
+    ImportDeferredSchema. Возвращает количество восстановленных объектов.
+    Полнотекстовые индексы таблиц с восстановленными
+    триггерами перестраиваются в той же транзакции.
+    """
+    deferred = list(ImportDeferredSchema.objects.all())
+    if not deferred:
+        return 0
+    schema = [item for item in deferred
+              if item.kind != ImportDeferredSchema.PRAGMA]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for item in schema:
+            cursor.execute(item.sql)
+        for table in sorted({item.table for item in schema
+                             if item.kind == ImportDeferredSchema.TRIGGER}):
+            if table in FTS_INDEXES:
+                rebuild_fts_index(table)
+        ImportDeferredSchema.objects.filter(
+            pk__in=[item.pk for item in schema]
+        ).delete()
+    # Режим журнала нельзя сменить внутри транзакции.
+    with connection.cursor() as cursor:
+        for item in deferred:
+            if item.kind == ImportDeferredSchema.PRAGMA:
+                cursor.execute(item.sql)
+                item.delete()
+    return len(deferred)
+
+
+@contextmanager
+def fast_sqlite(models):
+    """Ускоряет массовую загрузку в SQLite на время блока.
+
+    Включает WAL, отключает синхронную запись на диск, увеличивает кеш
+    страниц и удаляет неуникальные индексы и триггеры таблиц. Их SQL и
+    прежний режим журнала сохраняются в ImportDeferredSchema в одной
+    транзакции с удалением. После загрузки, а если она прервана - при
+    следующем запуске, они создаются заново, полнотекстовые индексы
+    перестраиваются одним проходом и выполняется ANALYZE.
+
+    С synchronous = OFF база не защищена от сбоя питания или ОС:
+    файл может остаться повреждённым, и загрузку нужно повторить на
+    резервной копии. Прерывание самого процесса загрузки безопасно.
+    """
+    if connection.vendor != 'sqlite':
+        print('Режим --fast поддерживается только для SQLite.')
+        yield
+        return
+    if restore_deferred_schema():
+        print(SCHEMA_RESTORED)
+    tables = table_names(models)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        deferred = [ImportDeferredSchema(
+            kind=ImportDeferredSchema.PRAGMA, name='journal_mode',
+            sql=f'PRAGMA journal_mode = {cursor.fetchone()[0]}'
+        )]
+        cursor.execute(
+            "SELECT type, name, tbl_name, sql FROM sqlite_master "
+            "WHERE type IN ('index', 'trigger') "
+            "AND sql IS NOT NULL AND tbl_name IN (%s)"
+            % ', '.join(['%s'] * len(tables)),
+            tables
+        )
+        deferred.extend(
+            ImportDeferredSchema(kind=kind, name=name, table=table, sql=sql)
+            for kind, name, table, sql in cursor.fetchall()
+            if not sql.upper().startswith('CREATE UNIQUE')
+        )
+        ImportDeferredSchema.objects.bulk_create(deferred)
+        for item in deferred[1:]:
+            cursor.execute(f'DROP {item.kind.upper()} "{item.name}"')
+    with connection.cursor() as cursor:
+        saved = {}
+        for pragma, value in FAST_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma}')
+            saved[pragma] = cursor.fetchone()[0]
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+    try:
+        yield
+    finally:
+        restore_deferred_schema()
+        with connection.cursor() as cursor:
+            for pragma, value in saved.items():
+                if pragma != 'journal_mode':
+                    cursor.execute(f'PRAGMA {pragma} = {value}')
+            cursor.execute('ANALYZE')
+
+
+class ColumnErrors(dict):
+    """Ошибки проверки файла: (колонка, описание) -> [количество, строки]."""
+
+    def add(self, column, message, rows):
+        entry = self.setdefault((column, message), [0, []])
+        entry[0] += len(rows)
+        entry[1].extend(rows[:REPORT_ROWS - len(entry[1])])
+
+    def report(self, file_name):
+        lines = [f'Ошибка проверки файла {file_name}:']
+        for (column, message), (count, rows) in self.items():
+            numbers = ', '.join(map(str, rows))
+            if count > len(rows):
+                numbers += ', ...'
+            lines.append(f'  {column}: {message} - {count} шт., '
+                         f'строки {numbers}')
+        return '\n'.join(lines)
+
+
+def integer_limits(field):
+    low = [validator.limit_value for validator in field.validators
+           if isinstance(validator, MinValueValidator)]
+    high = [validator.limit_value for validator in field.validators
+            if isinstance(validator, MaxValueValidator)]
+    return max(low, default=None), min(high, default=None)
+
+
+def check_integers(values, field):
+    low, high = integer_limits(field)
+    bad = []
+    for index, value in enumerate(values):
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            bad.append(index)
+            continue
+        if (low is not None and number < low) or (
+                high is not None and number > high):
+            bad.append(index)
+    return bad
+
+
+def parse_iso_datetime(value):
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return parse_datetime(value)
+
+
+def check_datetimes(values, field):
+    bad = []
+    for index, value in enumerate(values):
+        try:
+            if parse_iso_datetime(value) is None:
+                bad.append(index)
+        except (AttributeError, ValueError):
+            bad.append(index)
+    return bad
+
+
+def check_field_values(values, field):
+    if isinstance(field, (models.CharField, models.TextField)) and not (
+            field.validators or field.choices):
+        return []
+    bad = []
+    for index, value in enumerate(values):
+        try:
+            field.run_validators(field.to_python(value))
+            if field.choices and value not in dict(field.flatchoices):
+                bad.append(index)
+        except ValidationError:
+            bad.append(index)
+    return bad
+
+
+def foreign_key_check(related_model, known_ids):
+    def check(values, field):
+        try:
+            ids = [int(value) for value in values]
+        except (TypeError, ValueError):
+            return check_integers(values, field)
+        missing = set(ids) - known_ids[related_model]
+        if not missing:
+            return []
+        return [index for index, value in enumerate(ids) if value in missing]
+    return check
+
+
+def column_check(model, column, known_ids):
+    """Возвращает поле модели, функцию проверки колонки и описание ошибки."""
+    if column in FIELDS:
+        field_name, related_model = FIELDS[column]
+        return (
+            model._meta.get_field(field_name),
+            foreign_key_check(related_model, known_ids),
+            f'ссылка на несуществующую запись {related_model.__qualname__}'
+        )
+    field = model._meta.get_field(column)
+    if isinstance(field, models.IntegerField) or field.primary_key:
+        low, high = integer_limits(field)
+        limits = f' от {low}' if low is not None else ''
+        limits += f' до {high}' if high is not None else ''
+        return field, check_integers, f'ожидается целое число{limits}'
+    if isinstance(field, models.DateTimeField):
+        return field, check_datetimes, 'ожидается дата и время в ISO 8601'
+    return field, check_field_values, 'недопустимое значение'
+
+
+def validate_batch(rows, first_row, checks, errors):
+    """Проверяет пакет строк по колонкам."""
+    for column, (field, check, message) in checks.items():
+        values = [row.get(column) for row in rows]
+        positions = [
+            position for position, value in enumerate(values)
+            if value not in ('', None)
+        ]
+        if len(positions) < len(values):
+            empty = sorted(set(range(len(values))) - set(positions))
+            # Пустая строка допустима только для текстовых полей и NULL.
+            if not field.null and not isinstance(
+                    field, (models.CharField, models.TextField)):
+                errors.add(column, 'обязательное значение не заполнено',
+                           [first_row + position for position in empty])
+            values = [values[position] for position in positions]
+        else:
+            positions = range(len(values))
+        bad = check(values, field)
+        if bad:
+            errors.add(column, message,
+                       [first_row + positions[index] for index in bad])
+
+
+def validate_csv(file_name, model, known_ids, batch_size=BATCH_SIZE,
+                 keep_ids=False):
+    """Проверяет файл целиком до записи в базу.
+
+    Колонки каждого пакета проверяются отдельно: целые числа и их
+    диапазоны, даты ISO 8601, ссылки на записи по множествам
+    идентификаторов и валидаторы остальных полей. С keep_ids
+    идентификаторы строк файла добавляются к известным, чтобы на них
+    могли ссылаться следующие файлы. Возвращает найденные ошибки.
+    """
+    errors = ColumnErrors()
+    with open_csv_file(file_name) as file:
+        if file is None:
+            return errors
+        header, rows = read_rows(file)
+        checks = {}
+        for column in header:
+            try:
+                checks[column] = column_check(model, column, known_ids)
+            except FieldDoesNotExist:
+                errors.add(column, 'неизвестная колонка', [1])
+        # Первая строка файла - заголовок.
+        first_row = 2
+        for batch in batched(rows, batch_size):
+            validate_batch(batch, first_row, checks, errors)
+            if keep_ids and 'id' in header:
+                known_ids[model].update(
+                    int(row['id']) for row in batch
+                    if str(row['id']).isdigit()
+                )
+            first_row += len(batch)
+    return errors
+
+
+def load_table(file_name, batch_size):
+    """Загружает таблицу в процессе-обработчике."""
+    return load_csv(
+        file_name, FILES_CLASSES[file_name], KnownIds(), batch_size
+    )
 
 
 class Command(BaseCommand):
     """Класс загрузки тестовой базы данных."""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество строк в одном INSERT'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Количество процессов для разбора и загрузки таблиц'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Проверить данные без записи в базу'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Сбросить контрольные точки и загружать файлы с начала'
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Обновить только новые, изменённые и удалённые строки'
+        )
+        parser.add_argument(
+            '--fast',
+            action='store_true',
+            help='Ускоренная загрузка в SQLite с отложенным созданием индексов'
+        )
+        parser.add_argument(
+            '--skip-validation',
+            action='store_true',
+            help='Не проверять файлы перед загрузкой'
+        )
+
     def handle(self, *args, **options):
-        for key, value in FILES_CLASSES.items():
-            print(f'Загрузка таблицы {value.__qualname__}')
-            load_csv(key, value)
+        self.batch_size = options['batch_size']
+        self.workers = options['workers']
+        self.dry_run = options['dry_run']
+        if not self.dry_run and restore_deferred_schema():
+            print(SCHEMA_RESTORED)
+        if options['fast'] and not self.dry_run:
+            with fast_sqlite(FILES_CLASSES.values()):
+                return self.load(options)
+        return self.load(options)
+
+    def load(self, options):
+        if not options['skip_validation'] and not self.validate():
+            print('Загрузка отменена: исправьте ошибки или используйте '
+                  '--skip-validation.')
+            return
+        if options['incremental']:
+            return self.sync()
+        if options['restart'] and not self.dry_run:
+            ImportCheckpoint.objects.all().delete()
+        known_ids = KnownIds()
+        # SQLite допускает одну пишущую транзакцию, поэтому с ним таблицы
+        # пишутся по очереди, а параллельно разбираются только пакеты строк.
+        parallel_tables = (
+            self.workers > 1 and not self.dry_run
+            and connection.vendor != 'sqlite'
+        )
+        for level in dependency_levels(FILES_CLASSES):
+            if parallel_tables and len(level) > 1:
+                self.load_level(level)
+            else:
+                for key in level:
+                    self.load_table(key, known_ids)
+        if not self.dry_run:
+            self.process_loaded()
+
+    def process_loaded(self):
+        """Обработка после загрузки для всех таблиц, где она не выполнена.
+
+        Признак хранится в контрольной точке, поэтому таблица, загруженная
+        прерванным запуском, обрабатывается при следующем.
+        """
+        pending = ImportCheckpoint.objects.filter(
+            processed=False, row__gt=0, table__in=FILES_CLASSES
+        )
+        tables = list(pending.values_list('table', flat=True))
+        if not tables:
+            return
+        self.after_load([FILES_CLASSES[table] for table in tables])
+        pending.filter(table__in=tables).update(processed=True)
+
+    def validate(self):
+        """Проверяет все файлы и печатает отчёт об ошибках."""
+        known_ids = KnownIds()
+        referenced = set().union(*(
+            related_models(model) for model in FILES_CLASSES.values()
+        ))
+        valid = True
+        for level in dependency_levels(FILES_CLASSES):
+            for key in level:
+                model = FILES_CLASSES[key]
+                start = time.monotonic()
+                errors = validate_csv(key, model, known_ids, self.batch_size,
+                                      keep_ids=model in referenced)
+                if errors:
+                    valid = False
+                    print(errors.report(key))
+                else:
+                    print(f'Файл {key} проверен за '
+                          f'{time.monotonic() - start:.2f} с.')
+        return valid
+
+    def after_load(self, loaded, titles=None):
+        """Обработка загруженных таблиц.
+
+        Рейтинг пересчитывается для произведений из `titles`, а если они
+        неизвестны - для всех.
+        """
+        reset_sequences(loaded)
+        # bulk_create не отправляет сигналы, версии кеша API сдвигаются здесь.
+        for model in loaded:
+            if issubclass(model, SearchKeyMixin):
+                bump_names_version(model)
+        if Review in loaded:
+            if titles is None:
+                recalculate_ratings()
+            for batch in batched(sorted(titles or ()), self.batch_size):
+                recalculate_ratings(Title.objects.filter(pk__in=batch))
+            loaded.append(Title)
+        for model in set(loaded):
+            bump_version(model)
+
+    def sync(self):
+        """Инкрементальная загрузка полного снимка данных."""
+        known_ids = KnownIds()
+        changed, total, titles = [], Counter(), set()
+        for level in dependency_levels(FILES_CLASSES):
+            for key in level:
+                model = FILES_CLASSES[key]
+                stats, touched = sync_csv(key, model, known_ids,
+                                          self.batch_size, self.dry_run,
+                                          titles)
+                print(
+                    f'{model.__qualname__}: добавлено {stats["created"]}, '
+                    f'изменено {stats["updated"]}, '
+                    f'удалено {stats["deleted"]}, '
+                    f'без изменений {stats["unchanged"]}.'
+                )
+                total.update(stats)
+                if self.dry_run:
+                    continue
+                if model is User:
+                    reset_auth_hashes(touched)
+                if stats['created'] or stats['updated'] or stats['deleted']:
+                    changed.append(model)
+        print(
+            f'Итого: добавлено {total["created"]}, '
+            f'изменено {total["updated"]}, удалено {total["deleted"]}, '
+            f'без изменений {total["unchanged"]}.'
+        )
+        if self.dry_run:
+            print('Проверка без записи: изменения не сохранены.')
+        elif changed:
+            self.after_load(changed, titles)
+
+    def load_table(self, key, known_ids):
+        model = FILES_CLASSES[key]
+        print(f'Загрузка таблицы {model.__qualname__}')
+        return load_csv(key, model, known_ids, self.batch_size, self.workers,
+                        self.dry_run)
+
+    def load_level(self, level):
+        """Загружает независимые таблицы в параллельных процессах."""
+        print(f'Параллельная загрузка таблиц: {", ".join(level)}')
+        connections.close_all()
+        with ProcessPoolExecutor(min(self.workers, len(level)),
+                                 initializer=init_worker) as executor:
+            return list(executor.map(
+                load_table, level, repeat(self.batch_size)
+            ))
@@ -0,0 +1,131 @@
+import csv
+import gzip
+import json
+import os
+import time
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from reviews.management.commands.csv_load_data import FIELDS, FILES_CLASSES
+from reviews.models import Category, Genre, Title
+from reviews.rating import RATING_FIELDS
+from users.models import User
+
+CHUNK_SIZE = 2000
+
+# Вычисляемые поля не выгружаются: загрузчик пересчитывает их сам.
+EXCLUDED_FIELDS = {
+    Category: ('search_name',),
+    Genre: ('search_name',),
+    Title: RATING_FIELDS + ('search_name',),
+    User: ('search_username',),
+}
+
+
+def export_columns(model):
+    """Пары (атрибут модели, колонка файла) в раскладке csv_load_data."""
+    columns = {
+        field_name: column for column, (field_name, _) in FIELDS.items()
+    }
+    return [
+        (field.attname, columns.get(field.name, field.name))
+        for field in model._meta.concrete_fields
+        if field.name not in EXCLUDED_FIELDS.get(model, ())
+    ]
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def json_value(value):
+    """Даты выгружаются в NDJSON без потери микросекунд."""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'Тип {type(value).__name__} не поддерживается')
+
+
+def open_export_file(path, use_gzip):
+    if use_gzip:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def export_model(model, path, file_format, use_gzip, chunk_size=CHUNK_SIZE):
+    """Выгружает таблицу, читая её порциями через iterator().
+
+    Возвращает количество выгруженных строк.
+    """
+    attnames, columns = zip(*export_columns(model))
+    rows = model.objects.order_by('pk').values_list(*attnames).iterator(
+        chunk_size=chunk_size
+    )
+    count = 0
+    with open_export_file(path, use_gzip) as file:
+        if file_format == 'ndjson':
+            for row in rows:
+                file.write(json.dumps(
+                    dict(zip(columns, row)),
+                    default=json_value,
+                    ensure_ascii=False
+                ))
+                file.write('\n')
+                count += 1
+        else:
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow([csv_value(value) for value in row])
+                count += 1
+    return count
+
+
+class Command(BaseCommand):
+    """Выгрузка базы данных в файлы формата csv_load_data."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=os.path.join(settings.BASE_DIR, 'export'),
+            help='Каталог для выгружаемых файлов'
+        )
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'ndjson'),
+            default='csv',
+            help='Формат файлов'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Сжимать файлы gzip'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Количество строк, читаемых из базы за один раз'
+        )
+
+    def handle(self, *args, **options):
+        os.makedirs(options['output'], exist_ok=True)
+        extension = '.' + options['format']
+        if options['gzip']:
+            extension += '.gz'
+        for key, model in FILES_CLASSES.items():
+            path = os.path.join(options['output'], key + extension)
+            start = time.monotonic()
+            count = export_model(
+                model, path, options['format'], options['gzip'],
+                options['chunk_size']
+            )
+            print(
+                f'Таблица {model.__qualname__} выгружена в {path}: '
+                f'{count} строк за {time.monotonic() - start:.2f} с.'
+            )
@@ -0,0 +1,357 @@
+import csv
+import os
+import random
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import bump_names_version, bump_version
+from reviews.management.commands.csv_load_data import (FIELDS, FILES_CLASSES,
+                                                       batched, fast_sqlite,
+                                                       keep_file_dates,
+                                                       reset_sequences)
+from reviews.management.commands.export_data import open_export_file
+from reviews.rating import recalculate_ratings
+from reviews.utils import SearchKeyMixin
+
+BATCH_SIZE = 5000
+TEXT_POOL_SIZE = 4096
+
+WORDS = (
+    'фильм', 'книга', 'сюжет', 'герой', 'финал', 'автор', 'актёр', 'музыка',
+    'история', 'режиссёр', 'роман', 'сцена', 'диалог', 'персонаж', 'мир',
+    'отличный', 'скучный', 'неожиданный', 'сильный', 'слабый', 'добрый',
+    'мрачный', 'смешной', 'долгий', 'яркий', 'очень', 'совсем', 'снова',
+    'всегда', 'никогда', 'понравился', 'разочаровал', 'удивил', 'советую',
+)
+ADJECTIVES = (
+    'Тёмный', 'Последний', 'Красный', 'Тихий', 'Вечный', 'Забытый',
+    'Северный', 'Золотой', 'Дикий', 'Ночной', 'Старый', 'Белый',
+)
+NOUNS = (
+    'город', 'берег', 'остров', 'сад', 'путь', 'дом', 'ветер', 'лес',
+    'капитан', 'рыцарь', 'король', 'мастер', 'шторм', 'сон', 'огонь',
+)
+ROLES = (('user', 97), ('moderator', 2), ('admin', 1))
+START_DATE = datetime(2015, 1, 1, tzinfo=timezone.utc)
+PERIOD = timedelta(days=8 * 365)
+
+
+def zipf_weights(amount, exponent):
+    """Веса рангов 1..amount по закону Ципфа."""
+    return [1 / rank ** exponent for rank in range(1, amount + 1)]
+
+
+def allocate(total, weights, cap):
+    """Распределяет total по весам, не больше cap на элемент."""
+    if not total:
+        return [0] * len(weights)
+    scale = total / sum(weights)
+    counts = [min(int(weight * scale), cap) for weight in weights]
+    remaining = total - sum(counts)
+    index = 0
+    while remaining > 0:
+        if counts[index] < cap:
+            counts[index] += 1
+            remaining -= 1
+        index = (index + 1) % len(counts)
+    return counts
+
+
+class DatasetGenerator:
+    """Воспроизводимый по seed набор данных с неравномерной популярностью.
+
+    Число отзывов на произведение и активность пользователей подчиняются
+    закону Ципфа, число комментариев к отзыву - распределению Парето.
+    Строки выдаются генераторами в раскладке файлов csv_load_data.
+    """
+
+    def __init__(self, seed, categories, genres, titles, users, reviews,
+                 comments):
+        self.seed = seed
+        self.sizes = {
+            'category': categories,
+            'genre': genres,
+            'titles': titles,
+            'users': users,
+            'review': reviews,
+            'comments': comments,
+        }
+
+    def random(self, key):
+        # Своя последовательность для каждой таблицы: файлы можно
+        # генерировать по отдельности с тем же результатом.
+        return random.Random(f'{self.seed}:{key}')
+
+    def texts(self, rng, low=5, high=30):
+        """Тексты выбираются из заранее собранного набора: это быстрее."""
+        return [
+            ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+            for _ in range(TEXT_POOL_SIZE)
+        ]
+
+    def review_date(self, review_id):
+        """Дата отзыва растёт с его номером, поэтому не хранится.
+
+        Сначала считается доля периода: произведение периода на номер
+        переполняет timedelta уже на сотнях тысяч отзывов.
+        """
+        return START_DATE + PERIOD * (review_id / (self.sizes['review'] + 1))
+
+    def rows(self, key):
+        return getattr(self, key)()
+
+    def category(self):
+        for idx in range(1, self.sizes['category'] + 1):
+            yield {'id': idx, 'name': f'Категория {idx}',
+                   'slug': f'category-{idx}'}
+
+    def genre(self):
+        for idx in range(1, self.sizes['genre'] + 1):
+            yield {'id': idx, 'name': f'Жанр {idx}', 'slug': f'genre-{idx}'}
+
+    def titles(self):
+        rng = self.random('titles')
+        texts = self.texts(rng)
+        categories = self.sizes['category']
+        for idx in range(1, self.sizes['titles'] + 1):
+            yield {
+                'id': idx,
+                'name': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}',
+                'year': rng.randint(1900, 2023),
+                'description': rng.choice(texts),
+                'category': rng.randint(1, categories) if categories else '',
+            }
+
+    def genre_title(self):
+        rng = self.random('genre_title')
+        genres = self.sizes['genre']
+        if not genres:
+            return
+        cum_weights = list(accumulate(zipf_weights(genres, 1.0)))
+        link_id = 0
+        for title_id in range(1, self.sizes['titles'] + 1):
+            amount = min(rng.randint(1, 3), genres)
+            chosen = set()
+            while len(chosen) < amount:
+                chosen.add(bisect_left(
+                    cum_weights, rng.random() * cum_weights[-1]
+                ) + 1)
+            for genre_id in sorted(chosen):
+                link_id += 1
+                yield {'id': link_id, 'title_id': title_id,
+                       'genre_id': genre_id}
+
+    def users(self):
+        rng = self.random('users')
+        roles, weights = zip(*ROLES)
+        for idx in range(1, self.sizes['users'] + 1):
+            yield {
+                'id': idx,
+                'username': f'user{idx}',
+                'email': f'user{idx}@yamdb.fake',
+                'role': rng.choices(roles, weights)[0],
+                'bio': '',
+                'first_name': '',
+                'last_name': '',
+            }
+
+    def review(self):
+        """Отзывы: популярные произведения и активные авторы - по Ципфу.
+
+        Пара (автор, произведение) не повторяется.
+        """
+        rng = self.random('review')
+        texts = self.texts(rng)
+        users, titles = self.sizes['users'], self.sizes['titles']
+        ranks = list(range(titles))
+        rng.shuffle(ranks)
+        weights = zipf_weights(titles, 1.1)
+        counts = allocate(
+            self.sizes['review'], [weights[rank] for rank in ranks], users
+        )
+        cum_weights = list(accumulate(zipf_weights(users, 0.8)))
+        review_id = 0
+        for title_id, amount in enumerate(counts, 1):
+            mean = min(max(rng.gauss(7, 1.5), 1), 10)
+            for author in self.authors(rng, amount, users, cum_weights):
+                review_id += 1
+                score = round(rng.gauss(mean, 2))
+                yield {
+                    'id': review_id,
+                    'title_id': title_id,
+                    'text': rng.choice(texts),
+                    'author': author,
+                    'score': min(max(score, 1), 10),
+                    'pub_date': self.review_date(review_id).isoformat(),
+                }
+
+    def authors(self, rng, amount, users, cum_weights):
+        """Различные авторы отзывов на одно произведение."""
+        if amount * 2 > users:
+            return rng.sample(range(1, users + 1), amount)
+        chosen = set()
+        while len(chosen) < amount:
+            chosen.add(bisect_left(
+                cum_weights, rng.random() * cum_weights[-1]
+            ) + 1)
+        return sorted(chosen)
+
+    def comments(self):
+        """Комментарии: число на отзыв распределено по Парето."""
+        rng = self.random('comments')
+        texts = self.texts(rng, 3, 15)
+        reviews, users = self.sizes['review'], self.sizes['users']
+        remaining = self.sizes['comments']
+        if not reviews:
+            return
+        alpha = 1.5
+        mean = remaining / reviews * (alpha - 1) / alpha
+        comment_id = 0
+        for review_id in range(1, reviews + 1):
+            if not remaining:
+                return
+            amount = min(int(mean * rng.paretovariate(alpha) + rng.random()),
+                         remaining)
+            if review_id == reviews:
+                amount = remaining
+            remaining -= amount
+            review_date = self.review_date(review_id)
+            for _ in range(amount):
+                comment_id += 1
+                pub_date = review_date + timedelta(
+                    seconds=rng.randint(60, 30 * 24 * 3600)
+                )
+                yield {
+                    'id': comment_id,
+                    'review_id': review_id,
+                    'text': rng.choice(texts),
+                    'author': rng.randint(1, users),
+                    'pub_date': pub_date.isoformat(),
+                }
+
+
+def model_fields(row):
+    """Колонки файла в аргументы модели с `*_id` для внешних ключей."""
+    data = dict(row)
+    for column, (field_name, _) in FIELDS.items():
+        if column in data:
+            value = data.pop(column)
+            data[f'{field_name}_id'] = value if value != '' else None
+    return data
+
+
+def write_rows(rows, path, use_gzip):
+    count = 0
+    with open_export_file(path, use_gzip) as file:
+        writer = csv.writer(file)
+        for row in rows:
+            if not count:
+                writer.writerow(row.keys())
+            writer.writerow(row.values())
+            count += 1
+    return count
+
+
+def insert_rows(rows, model, batch_size=BATCH_SIZE):
+    count = 0
+    for batch in batched(rows, batch_size):
+        objs = [model(**model_fields(row)) for row in batch]
+        if issubclass(model, SearchKeyMixin):
+            for obj in objs:
+                obj.update_search_keys()
+        with keep_file_dates(model, batch[0]), transaction.atomic():
+            model.objects.bulk_create(objs)
+        count += len(objs)
+    return count
+
+
+class Command(BaseCommand):
+    """Генерация набора данных для нагрузочного тестирования."""
+
+    def add_arguments(self, parser):
+        for name, default in (('categories', 10), ('genres', 30),
+                              ('titles', 1000), ('users', 1000),
+                              ('reviews', 20000), ('comments', 50000)):
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Количество записей ({default} по умолчанию)'
+            )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел'
+        )
+        parser.add_argument(
+            '--output',
+            default=os.path.join(settings.BASE_DIR, 'generated'),
+            help='Каталог для csv-файлов'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true', help='Сжимать csv-файлы gzip'
+        )
+        parser.add_argument(
+            '--database', action='store_true',
+            help='Записать данные сразу в базу вместо csv-файлов'
+        )
+        parser.add_argument(
+            '--fast', action='store_true',
+            help='Ускоренная запись в SQLite, см. csv_load_data --fast'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Количество строк в одном INSERT'
+        )
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(
+            options['seed'], options['categories'], options['genres'],
+            options['titles'], options['users'], options['reviews'],
+            options['comments']
+        )
+        if options['reviews'] > options['titles'] * options['users']:
+            raise CommandError(
+                'Отзывов больше, чем пар пользователь-произведение.'
+            )
+        if options['comments'] and not options['reviews']:
+            raise CommandError('Для комментариев нужны отзывы.')
+        if not options['database']:
+            return self.write_files(generator, options)
+        if options['fast']:
+            with fast_sqlite(FILES_CLASSES.values()):
+                return self.write_database(generator, options)
+        return self.write_database(generator, options)
+
+    def write_files(self, generator, options):
+        os.makedirs(options['output'], exist_ok=True)
+        extension = '.csv.gz' if options['gzip'] else '.csv'
+        for key in FILES_CLASSES:
+            path = os.path.join(options['output'], key + extension)
+            start = time.monotonic()
+            count = write_rows(generator.rows(key), path, options['gzip'])
+            self.report(key, count, start)
+
+    def write_database(self, generator, options):
+        for key, model in FILES_CLASSES.items():
+            start = time.monotonic()
+            count = insert_rows(
+                generator.rows(key), model, options['batch_size']
+            )
+            self.report(key, count, start)
+        models = list(FILES_CLASSES.values())
+        reset_sequences(models)
+        recalculate_ratings()
+        for model in models:
+            bump_version(model)
+            if issubclass(model, SearchKeyMixin):
+                bump_names_version(model)
+
+    def report(self, key, count, start):
+        elapsed = time.monotonic() - start
+        rate = count / elapsed if elapsed else count
+        print(f'{key}: {count} строк за {elapsed:.2f} с '
+              f'({rate:.0f} строк/с).')
@@ -0,0 +1,57 @@
+# Generated by Django 3.2 on 2026-10-18 11:03
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_ratings(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+    totals = Review.objects.order_by().values('title').annotate(
+        score_sum=Sum('score'), score_count=Count('pk')
+    )
+    for row in totals:
+        Title.objects.filter(pk=row['title']).update(
+            rating_sum=row['score_sum'],
+            review_count=row['score_count'],
+            rating=row['score_sum'] / row['score_count']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_remove_comment_title'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='genretitle',
+            options={'ordering': ('genre',), 'verbose_name': 'Жанр произведения', 'verbose_name_plural': 'Жанры и произведений'},
+        ),
+        migrations.AlterModelOptions(
+            name='title',
+            options={'default_related_name': 'titles', 'ordering': ('-year', 'name'), 'verbose_name': 'Произведение', 'verbose_name_plural': 'Произведения'},
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='rating',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True, verbose_name='Рейтинг произведения'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество отзывов'),
+        ),
+        migrations.AlterField(
+            model_name='title',
+            name='year',
+            field=models.PositiveIntegerField(db_index=True, verbose_name='Год выпуска произведения'),
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2 on 2026-10-18 11:05
+
+from collections import defaultdict
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count
+
+import reviews.fields
+
+
+def fill_histograms(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+    histograms = defaultdict(reviews.fields.empty_histogram)
+    counts = Review.objects.filter(
+        score__gte=1, score__lte=10
+    ).order_by().values_list('title', 'score').annotate(total=Count('pk'))
+    for title_id, score, total in counts:
+        histograms[title_id][score - 1] = total
+    for title_id, histogram in histograms.items():
+        Title.objects.filter(pk=title_id).update(score_histogram=histogram)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_title_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='score_histogram',
+            field=reviews.fields.ScoreHistogramField(default=reviews.fields.empty_histogram, verbose_name='Распределение оценок'),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='score',
+            field=models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10)], verbose_name='Оценка произведения'),
+        ),
+        migrations.RunPython(fill_histograms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=64, unique=True, verbose_name='Таблица')),
+                ('file', models.CharField(max_length=255, verbose_name='Файл')),
+                ('row', models.PositiveBigIntegerField(default=0, verbose_name='Загружено строк')),
+                ('batch', models.PositiveIntegerField(default=0, verbose_name='Загружено пакетов')),
+                ('completed', models.BooleanField(default=False, verbose_name='Загрузка завершена')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка загрузки',
+                'verbose_name_plural': 'Контрольные точки загрузки',
+                'ordering': ('table',),
+            },
+        ),
+    ]
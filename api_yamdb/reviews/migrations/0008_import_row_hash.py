@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2026-10-18 11:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRowHash',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=64, verbose_name='Таблица')),
+                ('row_id', models.PositiveBigIntegerField(verbose_name='Идентификатор строки')),
+                ('hash', models.CharField(max_length=32, verbose_name='Хеш строки')),
+            ],
+            options={
+                'verbose_name': 'Хеш загруженной строки',
+                'verbose_name_plural': 'Хеши загруженных строк',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importrowhash',
+            constraint=models.UniqueConstraint(fields=('table', 'row_id'), name='unique_import_row_hash'),
+        ),
+    ]
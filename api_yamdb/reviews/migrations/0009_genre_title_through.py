@@ -0,0 +1,80 @@
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def merge_genre_links(apps, schema_editor):
+    """Переносит связи из автоматической таблицы Title.genre в GenreTitle.
+
+    Повторяющиеся пары (произведение, жанр) удаляются, чтобы можно было
+    добавить уникальное ограничение.
+    """
+    GenreTitle = apps.get_model('reviews', 'GenreTitle')
+    Title = apps.get_model('reviews', 'Title')
+    AutoGenreTitle = Title._meta.get_field('genre').remote_field.through
+    seen, duplicates = set(), []
+    links = GenreTitle.objects.order_by('pk').values_list(
+        'pk', 'title_id', 'genre_id'
+    )
+    for pk, title_id, genre_id in links.iterator():
+        if (title_id, genre_id) in seen:
+            duplicates.append(pk)
+        else:
+            seen.add((title_id, genre_id))
+    for start in range(0, len(duplicates), BATCH_SIZE):
+        GenreTitle.objects.filter(
+            pk__in=duplicates[start:start + BATCH_SIZE]
+        ).delete()
+    new_links = []
+    auto_links = AutoGenreTitle.objects.values_list('title_id', 'genre_id')
+    for title_id, genre_id in auto_links.iterator():
+        if (title_id, genre_id) not in seen:
+            seen.add((title_id, genre_id))
+            new_links.append(GenreTitle(title_id=title_id, genre_id=genre_id))
+    GenreTitle.objects.bulk_create(new_links, batch_size=BATCH_SIZE)
+
+
+def restore_auto_links(apps, schema_editor):
+    GenreTitle = apps.get_model('reviews', 'GenreTitle')
+    Title = apps.get_model('reviews', 'Title')
+    AutoGenreTitle = Title._meta.get_field('genre').remote_field.through
+    AutoGenreTitle.objects.bulk_create(
+        (
+            AutoGenreTitle(title_id=title_id, genre_id=genre_id)
+            for title_id, genre_id in GenreTitle.objects.values_list(
+                'title_id', 'genre_id'
+            ).iterator()
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_import_row_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_genre_links, restore_auto_links),
+        migrations.AddConstraint(
+            model_name='genretitle',
+            constraint=models.UniqueConstraint(
+                fields=('title', 'genre'), name='unique_title_genre'
+            ),
+        ),
+        migrations.RemoveField(
+            model_name='title',
+            name='genre',
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='genre',
+            field=models.ManyToManyField(
+                blank=True,
+                through='reviews.GenreTitle',
+                to='reviews.Genre',
+                verbose_name='Жанр произведения'
+            ),
+        ),
+    ]
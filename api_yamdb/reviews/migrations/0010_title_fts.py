@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from reviews.fts import (CREATE_TITLE_FTS, DROP_TITLE_FTS, TITLE_TABLE,
+                         fts_supported, rebuild_fts_index)
+
+
+def create_title_fts(apps, schema_editor):
+    """Индекс FTS5 и триггеры синхронизации создаются только в SQLite."""
+    connection = schema_editor.connection
+    if not fts_supported(connection):
+        return
+    for statement in CREATE_TITLE_FTS:
+        schema_editor.execute(statement)
+    rebuild_fts_index(TITLE_TABLE, connection)
+
+
+def drop_title_fts(apps, schema_editor):
+    if not fts_supported(schema_editor.connection):
+        return
+    for statement in DROP_TITLE_FTS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0009_genre_title_through'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_title_fts, drop_title_fts),
+    ]
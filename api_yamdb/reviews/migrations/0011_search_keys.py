@@ -0,0 +1,62 @@
+# Generated by Django 3.2 on 2026-10-18 11:57
+
+from django.db import migrations, models
+
+from reviews.fts import TITLE_FTS_TRIGGERS, fts_supported
+from reviews.utils import normalize_search_key
+
+BATCH_SIZE = 1000
+
+
+def fill_search_keys(apps, schema_editor):
+    for model_name in ('Category', 'Genre', 'Title'):
+        model = apps.get_model('reviews', model_name)
+        batch = []
+        for obj in model.objects.only('pk', 'name').iterator():
+            obj.search_name = normalize_search_key(obj.name, 256)
+            batch.append(obj)
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_update(batch, ['search_name'])
+                batch = []
+        model.objects.bulk_update(batch, ['search_name'])
+
+
+def restore_title_fts_triggers(apps, schema_editor):
+    """SQLite пересоздал таблицу произведений вместе с её триггерами."""
+    if not fts_supported(schema_editor.connection):
+        return
+    for statement in TITLE_FTS_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0010_title_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=256, verbose_name='Ключ поиска категории'),
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=256, verbose_name='Ключ поиска жанра'),
+        ),
+        # При откате триггеры восстанавливаются после удаления поля.
+        migrations.RunPython(
+            migrations.RunPython.noop, restore_title_fts_triggers
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=256, verbose_name='Ключ поиска произведения'),
+        ),
+        migrations.RunPython(
+            restore_title_fts_triggers, migrations.RunPython.noop
+        ),
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+from reviews.fts import (COMMENT_TABLE, REVIEW_TABLE, fts_create, fts_drop,
+                         fts_supported, rebuild_fts_index)
+
+TABLES = (REVIEW_TABLE, COMMENT_TABLE)
+
+
+def create_text_fts(apps, schema_editor):
+    """Индексы FTS5 текстов отзывов и комментариев, только в SQLite."""
+    connection = schema_editor.connection
+    if not fts_supported(connection):
+        return
+    for table in TABLES:
+        for statement in fts_create(table):
+            schema_editor.execute(statement)
+        rebuild_fts_index(table, connection)
+
+
+def drop_text_fts(apps, schema_editor):
+    if not fts_supported(schema_editor.connection):
+        return
+    for table in TABLES:
+        for statement in fts_drop(table):
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_search_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_text_fts, drop_text_fts),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0012_text_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='processed',
+            field=models.BooleanField(default=False, verbose_name='Обработка после загрузки выполнена'),
+        ),
+    ]
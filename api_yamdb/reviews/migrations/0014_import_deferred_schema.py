@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-18 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0013_import_checkpoint_processed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportDeferredSchema',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('index', 'Индекс'), ('trigger', 'Триггер'), ('pragma', 'Настройка')], max_length=16, verbose_name='Тип')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Название')),
+                ('table', models.CharField(blank=True, max_length=64, verbose_name='Таблица')),
+                ('sql', models.TextField(verbose_name='SQL для восстановления')),
+            ],
+            options={
+                'verbose_name': 'Отложенный объект схемы',
+                'verbose_name_plural': 'Отложенные объекты схемы',
+                'ordering': ('pk',),
+            },
+        ),
+    ]
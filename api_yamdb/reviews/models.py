@@ -1,17 +1,29 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     RegexValidator)
-from django.db import models
+from django.db import models, transaction
+
+from .fields import SCORE_BUCKETS, ScoreHistogramField
+from .utils import SearchKeyMixin
 
 User = get_user_model()
 
 
-class Category(models.Model):
+class Category(SearchKeyMixin, models.Model):
+    search_keys = {'search_name': 'name'}
+
     name = models.CharField(
         max_length=256,
         db_index=True,
         verbose_name='Название категории'
     )
+    search_name = models.CharField(
+        max_length=256,
+        db_index=True,
+        editable=False,
+        default='',
+        verbose_name='Ключ поиска категории'
+    )
     slug = models.SlugField(
         max_length=50,
         unique=True,
@@ -27,12 +39,21 @@ class Category(models.Model):
         return self.name
 
 
-class Genre(models.Model):
+class Genre(SearchKeyMixin, models.Model):
+    search_keys = {'search_name': 'name'}
+
     name = models.CharField(
         max_length=256,
         db_index=True,
         verbose_name='Название жанра'
     )
+    search_name = models.CharField(
+        max_length=256,
+        db_index=True,
+        editable=False,
+        default='',
+        verbose_name='Ключ поиска жанра'
+    )
     slug = models.SlugField(
         max_length=50,
         unique=True,
@@ -52,12 +73,21 @@ class Genre(models.Model):
         return self.name
 
 
-class Title(models.Model):
+class Title(SearchKeyMixin, models.Model):
+    search_keys = {'search_name': 'name'}
+
     name = models.CharField(
         max_length=256,
         db_index=True,
         verbose_name='Название произведения'
     )
+    search_name = models.CharField(
+        max_length=256,
+        db_index=True,
+        editable=False,
+        default='',
+        verbose_name='Ключ поиска произведения'
+    )
     year = models.PositiveIntegerField(
         db_index=True,
         verbose_name='Год выпуска произведения'
@@ -68,6 +98,7 @@ class Title(models.Model):
     )
     genre = models.ManyToManyField(
         Genre,
+        through='GenreTitle',
         blank=True,
         verbose_name='Жанр произведения'
     )
@@ -78,6 +109,26 @@ class Title(models.Model):
         on_delete=models.SET_NULL,
         verbose_name='Категория произведения'
     )
+    rating_sum = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Сумма оценок'
+    )
+    review_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество отзывов'
+    )
+    rating = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name='Рейтинг произведения'
+    )
+    score_histogram = ScoreHistogramField(
+        verbose_name='Распределение оценок'
+    )
 
     class Meta:
         default_related_name = 'titles'
@@ -88,6 +139,33 @@ class Title(models.Model):
     def __str__(self):
         return self.name
 
+    def set_score_histogram(self, histogram):
+        """Обновляет гистограмму оценок и производные от неё поля."""
+        self.score_histogram = list(histogram)
+        self.review_count = sum(histogram)
+        self.rating_sum = sum(
+            score * count for score, count in enumerate(histogram, 1)
+        )
+        self.rating = (
+            self.rating_sum / self.review_count if self.review_count else None
+        )
+
+    @property
+    def score_median(self):
+        if not self.review_count:
+            return None
+        return (
+            self._score_at((self.review_count - 1) // 2)
+            + self._score_at(self.review_count // 2)
+        ) / 2
+
+    def _score_at(self, index):
+        seen = 0
+        for score, count in enumerate(self.score_histogram, 1):
+            seen += count
+            if seen > index:
+                return score
+
 
 class GenreTitle(models.Model):
     genre = models.ForeignKey(
@@ -103,6 +181,12 @@ class GenreTitle(models.Model):
         verbose_name = 'Жанр произведения'
         verbose_name_plural = 'Жанры и произведений'
         ordering = ('genre',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('title', 'genre'),
+                name='unique_title_genre'
+            ),
+        )
 
     def __str__(self):
         return f'{self.title} принадлежит жанру {self.genre}'
@@ -118,7 +202,7 @@ class Review(models.Model):
         verbose_name='Автор отзыва'
     )
     score = models.PositiveSmallIntegerField(
-        validators=[MinValueValidator(0), MaxValueValidator(10)],
+        validators=[MinValueValidator(1), MaxValueValidator(SCORE_BUCKETS)],
         verbose_name='Оценка произведения'
     )
     pub_date = models.DateTimeField(
@@ -136,6 +220,12 @@ class Review(models.Model):
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('title', '-pub_date', '-id'),
+                name='review_title_pub_date_idx'
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=['author', 'title'],
@@ -146,6 +236,23 @@ class Review(models.Model):
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        # Сигнал pre_save обновляет рейтинг произведения в той же
+        # транзакции, что и отзыв.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        deferred = instance.get_deferred_fields()
+        instance._loaded_values = {
+            name: getattr(instance, name)
+            for name in ('score', 'title_id')
+            if name not in deferred
+        }
+        return instance
+
 
 class Comment(models.Model):
     text = models.TextField(
@@ -172,6 +279,123 @@ class Comment(models.Model):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('review', '-pub_date', '-id'),
+                name='comment_review_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text
+
+
+class ImportCheckpoint(models.Model):
+    table = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='Таблица'
+    )
+    file = models.CharField(
+        max_length=255,
+        verbose_name='Файл'
+    )
+    row = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Загружено строк'
+    )
+    batch = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Загружено пакетов'
+    )
+    completed = models.BooleanField(
+        default=False,
+        verbose_name='Загрузка завершена'
+    )
+    processed = models.BooleanField(
+        default=False,
+        verbose_name='Обработка после загрузки выполнена'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Обновлено'
+    )
+
+    class Meta:
+        verbose_name = 'Контрольная точка загрузки'
+        verbose_name_plural = 'Контрольные точки загрузки'
+        ordering = ('table',)
+
+    def __str__(self):
+        return f'{self.table}: {self.row} строк'
+
+
+class ImportRowHash(models.Model):
+    table = models.CharField(
+        max_length=64,
+        verbose_name='Таблица'
+    )
+    row_id = models.PositiveBigIntegerField(
+        verbose_name='Идентификатор строки'
+    )
+    hash = models.CharField(
+        max_length=32,
+        verbose_name='Хеш строки'
+    )
+
+    class Meta:
+        verbose_name = 'Хеш загруженной строки'
+        verbose_name_plural = 'Хеши загруженных строк'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('table', 'row_id'),
+                name='unique_import_row_hash'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.table}:{self.row_id}'
+
+
+class ImportDeferredSchema(models.Model):
+    """Объект схемы SQLite, удалённый на время загрузки в режиме --fast.
+
+    Запись создаётся в одной транзакции с удалением объекта, поэтому
+    прерванная загрузка не теряет индексы и триггеры.
+    """
+
+    INDEX = 'index'
+    TRIGGER = 'trigger'
+    PRAGMA = 'pragma'
+    KINDS = (
+        (INDEX, 'Индекс'),
+        (TRIGGER, 'Триггер'),
+        (PRAGMA, 'Настройка'),
+    )
+
+    kind = models.CharField(
+        max_length=16,
+        choices=KINDS,
+        verbose_name='Тип'
+    )
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Название'
+    )
+    table = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='Таблица'
+    )
+    sql = models.TextField(
+        verbose_name='SQL для восстановления'
+    )
+
+    class Meta:
+        verbose_name = 'Отложенный объект схемы'
+        verbose_name_plural = 'Отложенные объекты схемы'
+        ordering = ('pk',)
+
+    def __str__(self):
+        return f'{self.kind} {self.name}'
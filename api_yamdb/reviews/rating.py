@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField
+from django.db.models.functions import Cast, NullIf
+
+from .fields import SCORE_BUCKETS, empty_histogram
+from .models import Review, Title
+
+RATING_FIELDS = ('score_histogram', 'rating_sum', 'review_count', 'rating')
+
+
+def apply_score_change(title_id, old_score=None, new_score=None):
+    """Переносит оценку между корзинами гистограммы произведения.
+
+    Вызывается сигналами до записи отзыва в его транзакции. Первым
+    запросом UPDATE сдвигает сумму и количество оценок выражениями F() и
+    блокирует строку произведения, а на SQLite вся база блокируется на
+    запись. Поэтому гистограмма после него читается без гонки. SQLite не
+    ждёт освобождения блокировки, если транзакция начинает запись после
+    чтения, например индекса FTS в триггере отзыва. Поэтому блокировка
+    должна браться первой.
+    """
+    if not old_score or not 1 <= old_score <= SCORE_BUCKETS:
+        old_score = None
+    if not new_score or not 1 <= new_score <= SCORE_BUCKETS:
+        new_score = None
+    if old_score == new_score:
+        return
+    review_count = F('review_count') + (
+        (new_score is not None) - (old_score is not None)
+    )
+    rating_sum = F('rating_sum') + (new_score or 0) - (old_score or 0)
+    with transaction.atomic():
+        titles = Title.objects.filter(pk=title_id)
+        if not titles.update(
+            review_count=review_count,
+            rating_sum=rating_sum,
+            rating=Cast(rating_sum, FloatField()) / NullIf(review_count, 0)
+        ):
+            return
+        histogram = titles.values_list('score_histogram', flat=True).get()
+        if old_score:
+            histogram[old_score - 1] = max(histogram[old_score - 1] - 1, 0)
+        if new_score:
+            histogram[new_score - 1] += 1
+        titles.update(score_histogram=histogram)
+
+
+def recalculate_ratings(titles=None, batch_size=500):
+    """Пересчитывает рейтинг произведений по таблице отзывов."""
+    if titles is None:
+        titles = Title.objects.all()
+    histograms = defaultdict(empty_histogram)
+    counts = Review.objects.filter(
+        title__in=titles.values('pk'),
+        score__gte=1,
+        score__lte=SCORE_BUCKETS
+    ).order_by().values_list('title', 'score').annotate(total=Count('pk'))
+    for title_id, score, total in counts:
+        histograms[title_id][score - 1] = total
+    updated = []
+    for title in titles.only('pk').order_by().iterator():
+        title.set_score_histogram(histograms[title.pk])
+        updated.append(title)
+    Title.objects.bulk_update(updated, RATING_FIELDS, batch_size=batch_size)
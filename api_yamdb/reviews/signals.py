@@ -0,0 +1,48 @@
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Review, Title
+from .rating import apply_score_change, recalculate_ratings
+
+
+def loaded_values_known(instance):
+    loaded = getattr(instance, '_loaded_values', None)
+    return loaded is not None and len(loaded) == 2
+
+
+@receiver(pre_save, sender=Review)
+def update_rating_before_save(sender, instance, raw=False, **kwargs):
+    """Обновляет рейтинг произведения до записи отзыва."""
+    if raw:
+        return
+    score = int(instance.score)
+    if instance._state.adding:
+        apply_score_change(instance.title_id, new_score=score)
+    elif not loaded_values_known(instance):
+        return
+    elif instance._loaded_values['title_id'] != instance.title_id:
+        loaded = instance._loaded_values
+        apply_score_change(loaded['title_id'], old_score=loaded['score'])
+        apply_score_change(instance.title_id, new_score=score)
+    else:
+        apply_score_change(
+            instance.title_id, instance._loaded_values['score'], score
+        )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    """Пересчитывает рейтинг, если прежняя оценка отзыва неизвестна."""
+    if raw:
+        return
+    if not created and not loaded_values_known(instance):
+        recalculate_ratings(Title.objects.filter(pk=instance.title_id))
+    instance._loaded_values = {
+        'score': int(instance.score), 'title_id': instance.title_id
+    }
+
+
+@receiver(pre_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    """Обновляет рейтинг произведения до удаления отзыва."""
+    apply_score_change(instance.title_id, old_score=int(instance.score))
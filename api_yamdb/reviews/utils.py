@@ -0,0 +1,96 @@
+import unicodedata
+
+from django.db.models import Q
+
+# Краткая «и» - отдельная буква, её диакритический знак не удаляется.
+KEPT_LETTERS = frozenset('й')
+
+
+def normalize_search_key(value, max_length=None):
+    """Ключ поиска: регистр свёрнут, ё заменена на е, диакритика и
+    знаки препинания удалены, пробелы схлопнуты.
+    """
+    value = (value or '').casefold().replace('ё', 'е')
+    chars = []
+    for char in value:
+        if char in KEPT_LETTERS:
+            chars.append(char)
+            continue
+        for part in unicodedata.normalize('NFKD', char):
+            category = unicodedata.category(part)
+            if category.startswith('M'):
+                continue
+            chars.append(' ' if category[0] in 'PSZC' else part)
+    # Совместимое разложение может вернуть заглавные буквы (№ -> No).
+    key = ' '.join(''.join(chars).casefold().split())
+    return key[:max_length] if max_length else key
+
+
+def prefix_filter(field_name, text):
+    """Условие «ключ начинается с text» в виде диапазона по индексу.
+
+    Возвращает None, если после нормализации от запроса ничего не осталось.
+    """
+    key = normalize_search_key(text)
+    if not key:
+        return None
+    upper = key[:-1] + chr(ord(key[-1]) + 1)
+    return Q(**{f'{field_name}__gte': key, f'{field_name}__lt': upper})
+
+
+def contains_filter(field_name, text):
+    """Условие «ключ содержит text» для небольших таблиц без индекса.
+
+    Возвращает None, если после нормализации от запроса ничего не осталось.
+    """
+    key = normalize_search_key(text)
+    if not key:
+        return None
+    return Q(**{f'{field_name}__contains': key})
+
+
+class SearchKeyMixin:
+    """Заполняет нормализованные ключи поиска при сохранении модели.
+
+    `search_keys` сопоставляет поле ключа с исходным полем. Массовые
+    операции обходят save(), поэтому там нужно вызвать
+    update_search_keys() самостоятельно. После save() атрибут
+    `search_keys_changed` показывает, изменился ли какой-нибудь ключ.
+    """
+
+    search_keys = {}
+    search_keys_changed = True
+
+    def update_search_keys(self, sources=None):
+        """Пересчитывает ключи и возвращает True, если какой-то изменился.
+
+        Ключ, не загруженный из базы, считается изменённым.
+        """
+        deferred = self.get_deferred_fields()
+        changed = False
+        for key_field, source in self.search_keys.items():
+            if source in deferred or (
+                    sources is not None and source not in sources):
+                continue
+            key = normalize_search_key(
+                getattr(self, source),
+                self._meta.get_field(key_field).max_length
+            )
+            changed = changed or key_field in deferred or (
+                getattr(self, key_field) != key
+            )
+            setattr(self, key_field, key)
+        return changed
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.search_keys_changed = self.update_search_keys()
+        else:
+            update_fields = set(update_fields)
+            self.search_keys_changed = self.update_search_keys(update_fields)
+            kwargs['update_fields'] = update_fields | {
+                key_field for key_field, source in self.search_keys.items()
+                if source in update_fields
+            }
+        super().save(*args, **kwargs)
@@ -0,0 +1,40 @@
+# Generated by Django 3.2 on 2026-10-18 11:57
+
+from django.db import migrations, models
+
+from reviews.utils import normalize_search_key
+
+BATCH_SIZE = 1000
+
+
+def fill_search_username(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    batch = []
+    for user in User.objects.only('pk', 'username').iterator():
+        user.search_username = normalize_search_key(user.username, 150)
+        batch.append(user)
+        if len(batch) == BATCH_SIZE:
+            User.objects.bulk_update(batch, ['search_username'])
+            batch = []
+    User.objects.bulk_update(batch, ['search_username'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='search_username',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=150, verbose_name='Ключ поиска логина'),
+        ),
+        migrations.RunPython(fill_search_username, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='role',
+            field=models.CharField(choices=[('user', 'User'), ('moderator', 'Moderator'), ('admin', 'Admin')], default='user', help_text='Роль пользователя', max_length=20, verbose_name='Роль'),
+        ),
+    ]
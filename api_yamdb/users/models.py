@@ -2,8 +2,12 @@ from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.db import models
 
+from reviews.utils import SearchKeyMixin
+
+
+class User(SearchKeyMixin, AbstractUser):
+    search_keys = {'search_username': 'username'}
 
-class User(AbstractUser):
     class UserRole(models.TextChoices):
         USER = 'user'
         MODERATOR = 'moderator'
@@ -19,6 +23,13 @@ class User(AbstractUser):
             message='Имя пользователя содержит недопустимый символ'
         )]
     )
+    search_username = models.CharField(
+        max_length=150,
+        db_index=True,
+        editable=False,
+        default='',
+        verbose_name='Ключ поиска логина'
+    )
     email = models.EmailField(
         max_length=254,
         verbose_name='Email',
@@ -0,0 +1,157 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08RatingAPI:
+
+    def test_01_rating_is_stored(self, admin_client, user_client,
+                                 moderator_client):
+        from reviews.models import Title
+
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        create_single_review(admin_client, title_id, 'Отлично', 9)
+        create_single_review(user_client, title_id, 'Так себе', 4)
+        response = create_single_review(
+            moderator_client, title_id, 'Неплохо', 5
+        )
+
+        title = Title.objects.get(pk=title_id)
+        assert (title.rating_sum, title.review_count) == (18, 3), (
+            'Проверьте, что при создании отзыва у произведения обновляются '
+            'сохранённые сумма оценок и количество отзывов.'
+        )
+        assert title.rating == 6, (
+            'Проверьте, что при создании отзыва у произведения '
+            'пересчитывается сохранённый рейтинг.'
+        )
+
+        review_url = (
+            f'/api/v1/titles/{title_id}/reviews/{response.json()["id"]}/'
+        )
+        moderator_client.patch(review_url, data={'score': 8})
+        title.refresh_from_db()
+        assert (title.rating_sum, title.review_count) == (21, 3), (
+            'Проверьте, что при изменении оценки в отзыве сохранённый '
+            'рейтинг произведения обновляется.'
+        )
+
+        moderator_client.delete(review_url)
+        title.refresh_from_db()
+        assert (title.rating_sum, title.review_count) == (13, 2), (
+            'Проверьте, что при удалении отзыва сохранённый рейтинг '
+            'произведения обновляется.'
+        )
+        response = admin_client.get(f'/api/v1/titles/{title_id}/')
+        assert response.json().get('rating') == 6, (
+            'Проверьте, что поле `rating` в ответе на GET-запрос к '
+            '`/api/v1/titles/{title_id}/` берётся из сохранённого рейтинга.'
+        )
+
+    def test_02_titles_ordering_by_rating(self, client, admin_client,
+                                          user_client):
+        titles, _, _ = create_titles(admin_client)
+        create_single_review(user_client, titles[0]['id'], 'Плохо', 2)
+        create_single_review(user_client, titles[1]['id'], 'Хорошо', 8)
+
+        response = client.get('/api/v1/titles/?ordering=-rating')
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что GET-запрос к `/api/v1/titles/` с параметром '
+            '`ordering=-rating` возвращает ответ со статусом 200.'
+        )
+        names = [title['name'] for title in response.json()['results']]
+        assert names == [titles[1]['name'], titles[0]['name']], (
+            'Проверьте, что произведения можно отсортировать по рейтингу.'
+        )
+
+    def test_03_title_rating_histogram(self, client, admin_client,
+                                       user_client, moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        url = f'/api/v1/titles/{title_id}/rating/'
+
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что GET-запрос неавторизованного пользователя к '
+            '`/api/v1/titles/{title_id}/rating/` возвращает ответ со '
+            'статусом 200.'
+        )
+        assert response.json() == {
+            'histogram': [0] * 10, 'mean': None, 'median': None, 'count': 0
+        }, (
+            'Проверьте, что для произведения без отзывов эндпоинт '
+            '`/api/v1/titles/{title_id}/rating/` возвращает пустую '
+            'гистограмму.'
+        )
+
+        create_single_review(admin_client, title_id, 'Отлично', 10)
+        create_single_review(user_client, title_id, 'Так себе', 3)
+        response = create_single_review(
+            moderator_client, title_id, 'Неплохо', 6
+        )
+        moderator_client.patch(
+            f'/api/v1/titles/{title_id}/reviews/{response.json()["id"]}/',
+            data={'score': 7}
+        )
+
+        data = client.get(url).json()
+        assert data['histogram'] == [0, 0, 1, 0, 0, 0, 1, 0, 0, 1], (
+            'Проверьте, что гистограмма оценок обновляется при создании и '
+            'изменении отзывов.'
+        )
+        assert (data['count'], data['median']) == (3, 7), (
+            'Проверьте, что эндпоинт `/api/v1/titles/{title_id}/rating/` '
+            'возвращает количество отзывов и медиану оценок.'
+        )
+        assert data['mean'] == pytest.approx(20 / 3), (
+            'Проверьте, что эндпоинт `/api/v1/titles/{title_id}/rating/` '
+            'возвращает среднюю оценку.'
+        )
+
+    def test_04_concurrent_reviews(self, admin_client, django_user_model):
+        from concurrent.futures import ThreadPoolExecutor
+        from threading import Barrier
+
+        from django.db import connection
+
+        from reviews.models import Review, Title
+
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        authors = [
+            django_user_model.objects.create_user(
+                username=f'critic{number}', email=f'critic{number}@yamdb.fake'
+            )
+            for number in range(8)
+        ]
+        barrier = Barrier(len(authors))
+
+        def write_review(number):
+            barrier.wait()
+            try:
+                Review.objects.create(
+                    title_id=title_id, author=authors[number],
+                    text='Параллельный отзыв', score=number % 10 + 1
+                )
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(len(authors)) as executor:
+            list(executor.map(write_review, range(len(authors))))
+
+        title = Title.objects.get(pk=title_id)
+        scores = [number % 10 + 1 for number in range(len(authors))]
+        assert (title.review_count, title.rating_sum) == (
+            len(scores), sum(scores)
+        ), (
+            'Проверьте, что параллельные отзывы к одному произведению не '
+            'теряют обновления рейтинга.'
+        )
+        assert sum(title.score_histogram) == len(scores), (
+            'Проверьте, что параллельные отзывы к одному произведению не '
+            'теряют обновления гистограммы оценок.'
+        )
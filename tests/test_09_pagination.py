@@ -0,0 +1,187 @@
+import base64
+import json
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_single_comment, create_single_review
+
+
+def create_title(name, year=2000):
+    from reviews.models import Title
+
+    return {'id': Title.objects.create(name=name, year=year).pk}
+
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(
+        json.dumps({'p': position}).encode()
+    ).decode()
+
+
+def walk_cursor_pages(client, url):
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что GET-запрос к `{url}` в курсорном режиме '
+            'пагинации возвращает ответ со статусом 200.'
+        )
+        data = response.json()
+        pages.append(data)
+        url = data['next']
+    return pages
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09PaginationAPI:
+
+    def test_01_titles_cursor_pagination(self, client):
+        names = ['Д', 'А', 'Е', 'В', 'Ж', 'Б', 'Г']
+        for name in names:
+            create_title(name)
+
+        pages = walk_cursor_pages(client, '/api/v1/titles/?pagination=cursor')
+        assert 'count' not in pages[0], (
+            'Проверьте, что в курсорном режиме пагинации ответ не содержит '
+            'ключа `count`, если подсчёт не запрошен.'
+        )
+        result = [
+            title['name'] for page in pages for title in page['results']
+        ]
+        assert result == sorted(names), (
+            'Проверьте, что в курсорном режиме пагинации `/api/v1/titles/` '
+            'возвращает все произведения, отсортированные по названию.'
+        )
+        assert pages[0]['previous'] is None, (
+            'Проверьте, что у первой страницы курсорной пагинации нет '
+            'ссылки на предыдущую страницу.'
+        )
+
+        previous = client.get(pages[-1]['previous']).json()
+        assert previous['results'] == pages[0]['results'], (
+            'Проверьте, что ссылка `previous` в курсорном режиме пагинации '
+            'ведёт на предыдущую страницу.'
+        )
+
+        data = client.get(
+            '/api/v1/titles/?pagination=cursor&count=true'
+        ).json()
+        assert data.get('count') == len(names), (
+            'Проверьте, что в курсорном режиме пагинации параметр '
+            '`count=true` добавляет в ответ общее количество записей.'
+        )
+
+        response = client.get('/api/v1/titles/?cursor=broken')
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Проверьте, что запрос с некорректным курсором возвращает ответ '
+            'со статусом 404.'
+        )
+        for position in (['a', 'x'], [None, 1], ['a', [1]]):
+            response = client.get(
+                '/api/v1/titles/', {'cursor': encode_cursor(position)}
+            )
+            assert response.status_code == HTTPStatus.NOT_FOUND, (
+                'Проверьте, что курсор со значениями неверного типа '
+                'возвращает ответ со статусом 404.'
+            )
+
+    def test_02_comments_cursor_pagination(self, client, user_client):
+        title = create_title('Терминатор', 1984)
+        review = create_single_review(
+            user_client, title['id'], 'Отлично', 10
+        ).json()
+        comment_ids = [
+            create_single_comment(
+                user_client, title['id'], review['id'], f'Комментарий {idx}'
+            ).json()['id']
+            for idx in range(9)
+        ]
+
+        url = (
+            f'/api/v1/titles/{title["id"]}/reviews/{review["id"]}/comments/'
+        )
+        pages = walk_cursor_pages(client, f'{url}?pagination=cursor')
+        result = [
+            comment['id'] for page in pages for comment in page['results']
+        ]
+        assert result == comment_ids[::-1], (
+            f'Проверьте, что в курсорном режиме пагинации `{url}` возвращает '
+            'все комментарии от новых к старым без пропусков и повторов.'
+        )
+        assert len(pages) == 3, (
+            'Проверьте, что курсорная пагинация использует размер страницы '
+            'из настроек проекта.'
+        )
+
+        reviews_url = f'/api/v1/titles/{title["id"]}/reviews/'
+        for position in (['garbage', 1], [None, 1], ['2020-01-01', 'x']):
+            response = client.get(
+                reviews_url, {'cursor': encode_cursor(position)}
+            )
+            assert response.status_code == HTTPStatus.NOT_FOUND, (
+                f'Проверьте, что `{reviews_url}` с курсором, содержащим '
+                'некорректную дату или id, возвращает ответ со статусом 404.'
+            )
+
+    def test_03_titles_count_cache(self, client):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        for name in ('А', 'Б', 'В'):
+            create_title(name)
+        url = '/api/v1/titles/?year=2000'
+
+        assert client.get(url).json()['count'] == 3
+        with CaptureQueriesContext(connection) as context:
+            data = client.get(url).json()
+        count_queries = [
+            query for query in context.captured_queries
+            if 'COUNT(' in query['sql']
+        ]
+        assert data['count'] == 3 and not count_queries, (
+            'Проверьте, что повторный запрос к `/api/v1/titles/` с теми же '
+            'параметрами фильтрации берёт количество записей из кеша.'
+        )
+
+        create_title('Г')
+        assert client.get(url).json()['count'] == 4, (
+            'Проверьте, что кеш количества произведений сбрасывается при '
+            'добавлении нового произведения.'
+        )
+
+    def test_04_titles_estimated_count(self, client, settings):
+        settings.API_ESTIMATED_COUNT_LIMIT = 5
+        for idx in range(7):
+            create_title(f'Произведение {idx}')
+
+        data = client.get('/api/v1/titles/?count=estimated').json()
+        assert (data['count'], data['count_is_exact']) == (5, False), (
+            'Проверьте, что при параметре `count=estimated` подсчёт '
+            'произведений ограничивается настройкой '
+            '`API_ESTIMATED_COUNT_LIMIT`.'
+        )
+        data = client.get('/api/v1/titles/?count=estimated&page=2').json()
+        assert len(data['results']) == 3, (
+            'Проверьте, что при оценочном подсчёте доступны страницы за '
+            'пределами оценки.'
+        )
+
+        data = client.get('/api/v1/titles/?count=estimated&year=1').json()
+        assert (data['count'], data['count_is_exact']) == (0, True), (
+            'Проверьте, что при параметре `count=estimated` небольшие '
+            'выборки считаются точно.'
+        )
+
+        for idx in range(7, 10):
+            create_title(f'Произведение {idx}')
+        data = client.get('/api/v1/titles/?count=estimated&page=2').json()
+        assert data['count_is_exact'] is False and data['next'], (
+            'Проверьте, что при оценочном подсчёте ссылка на следующую '
+            'страницу определяется по наличию записей, а не по оценке.'
+        )
+        data = client.get('/api/v1/titles/?count=estimated&page=3').json()
+        assert len(data['results']) == 2 and data['next'] is None, (
+            'Проверьте, что при оценочном подсчёте на последней странице '
+            'нет ссылки на следующую.'
+        )
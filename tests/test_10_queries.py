@@ -0,0 +1,123 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def create_titles_with_relations(start, amount):
+    from reviews.models import Category, Genre, Title
+
+    genres = [
+        Genre.objects.get_or_create(name=slug, slug=slug)[0]
+        for slug in ('horror', 'comedy', 'drama')
+    ]
+    for idx in range(start, start + amount):
+        category = Category.objects.create(
+            name=f'Категория {idx}', slug=f'category-{idx}'
+        )
+        title = Title.objects.create(
+            name=f'Произведение {idx}', year=2000, category=category
+        )
+        title.genre.set(genres[:idx % len(genres) + 1])
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, (
+        f'Проверьте, что GET-запрос к `{url}` возвращает ответ со статусом '
+        '200.'
+    )
+    return len(context.captured_queries)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10QueriesAPI:
+
+    def test_01_titles_list_queries(self, client):
+        create_titles_with_relations(0, 1)
+        single = count_queries(client, '/api/v1/titles/')
+
+        create_titles_with_relations(1, 3)
+        full_page = count_queries(client, '/api/v1/titles/')
+        assert single == full_page, (
+            'Проверьте, что количество SQL-запросов при GET-запросе к '
+            '`/api/v1/titles/` не зависит от количества произведений на '
+            f'странице: {single} запрос(ов) для одного произведения и '
+            f'{full_page} для полной страницы.'
+        )
+
+    def test_02_reviews_and_comments_projection(self, client, admin_client,
+                                                admin, user_client, user,
+                                                moderator_client, moderator):
+        from tests.utils import create_comments
+
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        _, reviews, titles = create_comments(admin_client, author_map)
+        urls = (
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/',
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+            f'{reviews[0]["id"]}/comments/',
+        )
+        for url in urls:
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url)
+            assert len(response.json()['results']) == len(author_map)
+            sql = ' '.join(
+                query['sql'] for query in context.captured_queries
+            )
+            assert len(context.captured_queries) <= 3, (
+                f'Проверьте, что при GET-запросе к `{url}` авторы отзывов '
+                'и комментариев загружаются вместе со списком, а не '
+                'отдельным запросом на каждую запись.'
+            )
+            assert '"bio"' not in sql and '"description"' not in sql, (
+                f'Проверьте, что при GET-запросе к `{url}` из базы не '
+                'загружаются поля, отсутствующие в ответе.'
+            )
+
+    def test_03_nested_parents_loaded_once(self, client, admin_client,
+                                           user_client):
+        from tests.utils import (create_single_comment,
+                                 create_single_review, create_titles)
+
+        titles, _, _ = create_titles(admin_client)
+        with CaptureQueriesContext(connection) as context:
+            review = create_single_review(
+                user_client, titles[0]['id'], 'Отлично', 9
+            ).json()
+        title_queries = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "reviews_title"' in query['sql']
+            and 'score_histogram' not in query['sql']
+        ]
+        assert len(title_queries) == 1, (
+            'Проверьте, что при создании отзыва произведение загружается '
+            'из базы один раз за запрос.'
+        )
+
+        create_single_comment(
+            user_client, titles[0]['id'], review['id'], 'Согласен'
+        )
+        url = (
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+            f'{review["id"]}/comments/?pagination=cursor'
+        )
+        assert count_queries(client, url) == 1, (
+            f'Проверьте, что GET-запрос к `{url}` выполняется одним '
+            'запросом, проверяющим связь отзыва с произведением.'
+        )
+
+        url = (
+            f'/api/v1/titles/{titles[1]["id"]}/reviews/'
+            f'{review["id"]}/comments/'
+        )
+        response = client.get(url)
+        assert response.status_code == 404, (
+            f'Проверьте, что GET-запрос к `{url}` для отзыва другого '
+            'произведения возвращает ответ со статусом 404.'
+        )
@@ -0,0 +1,163 @@
+import time
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11CacheAPI:
+
+    def test_01_anonymous_response_cache(self, client, admin_client,
+                                         user_client):
+        titles, _, _ = create_titles(admin_client)
+        url = '/api/v1/titles/'
+
+        response = client.get(url)
+        assert response['X-Cache'] == 'MISS', (
+            f'Проверьте, что первый анонимный GET-запрос к `{url}` '
+            'обрабатывается без кеша.'
+        )
+        response = client.get(url)
+        assert response['X-Cache'] == 'HIT', (
+            f'Проверьте, что повторный анонимный GET-запрос к `{url}` '
+            'отдаётся из кеша.'
+        )
+        assert response.json()['count'] == len(titles)
+
+        response = client.get(f'{url}?year=1984')
+        assert response['X-Cache'] == 'MISS', (
+            'Проверьте, что параметры запроса входят в ключ кеша ответов.'
+        )
+
+        create_single_review(user_client, titles[0]['id'], 'Отлично', 9)
+        response = client.get(f'{url}{titles[0]["id"]}/')
+        assert response.json()['rating'] == 9
+        response = client.get(url)
+        assert response['X-Cache'] == 'MISS', (
+            'Проверьте, что кеш ответов `/api/v1/titles/` сбрасывается при '
+            'добавлении отзыва.'
+        )
+        ratings = {
+            title['id']: title['rating'] for title in response.json()['results']
+        }
+        assert ratings[titles[0]['id']] == 9, (
+            'Проверьте, что после изменения данных кеш не отдаёт '
+            'устаревший ответ.'
+        )
+
+        response = admin_client.get(url)
+        assert 'X-Cache' not in response, (
+            'Проверьте, что ответы авторизованным пользователям не '
+            'кешируются.'
+        )
+
+    def test_02_cache_stats(self, client, admin_client, user_client):
+        url = '/api/v1/cache/stats/'
+        client.get('/api/v1/genres/')
+        client.get('/api/v1/genres/')
+
+        response = user_client.get(url)
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            f'Проверьте, что `{url}` недоступен пользователю без прав '
+            'администратора.'
+        )
+        response = admin_client.get(url)
+        assert response.json() == {'hits': 1, 'misses': 1}, (
+            f'Проверьте, что `{url}` возвращает счётчики попаданий и '
+            'промахов кеша ответов.'
+        )
+
+    def test_03_conditional_get(self, client, admin_client, user_client):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        titles, _, _ = create_titles(admin_client)
+        create_single_review(user_client, titles[0]['id'], 'Отлично', 9)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+
+        response = client.get(url)
+        assert response.get('ETag')
+        if response.get('Last-Modified') is None:
+            # Last-Modified не отдаётся в секунду последнего изменения.
+            time.sleep(1 - time.time() % 1)
+            response = client.get(url)
+        etag = response.get('ETag')
+        assert etag and response.get('Last-Modified'), (
+            f'Проверьте, что ответ на GET-запрос к `{url}` содержит '
+            'заголовки `ETag` и `Last-Modified`.'
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            f'Проверьте, что GET-запрос к `{url}` с актуальным '
+            '`If-None-Match` возвращает ответ со статусом 304.'
+        )
+        assert not context.captured_queries, (
+            'Проверьте, что ответ 304 формируется без запросов к базе данных.'
+        )
+
+        last_modified = response['Last-Modified']
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            f'Проверьте, что GET-запрос к `{url}` с актуальным '
+            '`If-Modified-Since` возвращает ответ со статусом 304.'
+        )
+
+        create_single_review(admin_client, titles[0]['id'], 'Хорошо', 7)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что после добавления отзыва GET-запрос к `{url}` '
+            'с устаревшим `If-None-Match` возвращает ответ со статусом 200.'
+        )
+        assert response['ETag'] != etag
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что после добавления отзыва, в том числе в ту же '
+            f'секунду, что и предыдущий ответ, GET-запрос к `{url}` с '
+            '`If-Modified-Since` возвращает ответ со статусом 200.'
+        )
+
+    def test_04_shared_cache_check(self, monkeypatch):
+        from types import SimpleNamespace
+
+        from api import checks
+
+        def errors(backend):
+            monkeypatch.setattr(checks, 'settings', SimpleNamespace(
+                DEBUG=False, CACHES={'default': {
+                    'BACKEND': f'django.core.cache.backends.{backend}'
+                }}
+            ))
+            return [error.id for error in checks.check_shared_cache(None)]
+
+        for backend in ('locmem.LocMemCache', 'filebased.FileBasedCache',
+                        'db.DatabaseCache'):
+            assert errors(backend) == ['api.E001'], (
+                'Проверьте, что проверка проекта сообщает об ошибке, если '
+                'кеш API не общий для процессов или не атомарный.'
+            )
+        assert not errors('memcached.PyMemcacheCache'), (
+            'Проверьте, что memcached проходит проверку кеша API.'
+        )
+
+    def test_05_versions_bumped_after_commit(self):
+        from django.db import transaction
+
+        from api.cache import get_versions
+        from reviews.models import Title
+
+        before = get_versions((Title,))
+        with transaction.atomic():
+            Title.objects.create(name='Солярис', year=1972)
+            assert get_versions((Title,)) == before, (
+                'Проверьте, что версия данных сдвигается только после '
+                'фиксации транзакции, иначе параллельный запрос закеширует '
+                'старые данные под новой версией.'
+            )
+        assert get_versions((Title,)) != before, (
+            'Проверьте, что версия данных сдвигается после фиксации '
+            'транзакции.'
+        )
@@ -0,0 +1,96 @@
+from http import HTTPStatus
+
+import pytest
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from tests.utils import create_titles
+
+
+def get_token_client(user):
+    response = APIClient().post('/api/v1/auth/token/', data={
+        'username': user.username,
+        'confirmation_code': default_token_generator.make_token(user)
+    })
+    assert response.status_code == HTTPStatus.OK, (
+        'Проверьте, что POST-запрос к `/api/v1/auth/token/` с корректным '
+        'кодом подтверждения возвращает ответ со статусом 200.'
+    )
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Bearer {response.json()["token"]}'
+    )
+    return client
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12AuthAPI:
+
+    def test_01_stateless_token(self, admin_client, admin, user):
+        titles, _, _ = create_titles(admin_client)
+        client = get_token_client(user)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+
+        client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        assert not any(
+            'users_user"."password' in query['sql']
+            for query in context.captured_queries
+        ), (
+            'Проверьте, что при аутентификации по выданному токену '
+            'пользователь не загружается из базы на каждый запрос.'
+        )
+
+        response = client.post(url, data={'text': 'Отлично', 'score': 9})
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Проверьте, что пользователь с выданным токеном может '
+            'оставить отзыв.'
+        )
+        assert response.json()['author'] == user.username
+
+        response = client.get('/api/v1/users/me/')
+        assert response.json().get('email') == user.email, (
+            'Проверьте, что `/api/v1/users/me/` возвращает данные '
+            'пользователя из базы при аутентификации по токену.'
+        )
+
+    def test_02_role_change_revokes_token(self, user):
+        client = get_token_client(user)
+        assert client.get('/api/v1/users/').status_code == (
+            HTTPStatus.FORBIDDEN
+        )
+
+        user.role = 'admin'
+        user.save()
+        response = client.get('/api/v1/users/')
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Проверьте, что после изменения роли пользователя ранее '
+            'выданный токен перестаёт действовать.'
+        )
+        response = get_token_client(user).get('/api/v1/users/')
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что новый токен учитывает изменённую роль.'
+        )
+
+    def test_03_auth_hash_expires(self, user, settings):
+        from django.core.cache import cache
+
+        from users.models import User
+
+        settings.API_AUTH_HASH_TIMEOUT = 0
+        # Отпечаток, сохранённый при создании пользователя фикстурой.
+        cache.clear()
+        client = get_token_client(user)
+        assert client.get('/api/v1/users/me/').status_code == HTTPStatus.OK
+
+        User.objects.filter(pk=user.pk).update(role='admin')
+        response = client.get('/api/v1/users/me/')
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Проверьте, что отпечаток прав хранится в кеше не дольше '
+            '`API_AUTH_HASH_TIMEOUT` секунд, и изменение роли в обход '
+            'сигналов отзывает токен после истечения этого срока.'
+        )
@@ -0,0 +1,564 @@
+import csv
+import os
+
+import pytest
+from django.core.management import call_command
+
+
+def count_csv_rows(directory, file_name):
+    with open(os.path.join(directory, f'{file_name}.csv'),
+              encoding='utf-8') as file:
+        return sum(1 for _ in csv.reader(file)) - 1
+
+
+def write_csv(directory, file_name, rows):
+    with open(os.path.join(directory, f'{file_name}.csv'), 'w',
+              encoding='utf-8', newline='') as file:
+        csv.writer(file).writerows(rows)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13CsvLoad:
+
+    def test_01_load_static_data(self, settings, capsys):
+        from django.db.models import Avg
+
+        from reviews.management.commands.csv_load_data import FILES_CLASSES
+        from reviews.models import Review, Title
+
+        call_command('csv_load_data', '--batch-size', '7')
+        for file_name, model in FILES_CLASSES.items():
+            expected = count_csv_rows(settings.CSV_FILES, file_name)
+            assert model.objects.count() == expected, (
+                f'Проверьте, что команда `csv_load_data` загружает все строки '
+                f'файла `{file_name}.csv`.'
+            )
+        assert 'строк/с' in capsys.readouterr().out, (
+            'Проверьте, что команда `csv_load_data` выводит скорость '
+            'загрузки каждой таблицы.'
+        )
+
+        title = Title.objects.get(pk=1)
+        assert title.search_name == 'побег из шоушенка', (
+            'Проверьте, что команда `csv_load_data` заполняет ключи поиска.'
+        )
+        average = Review.objects.filter(title=title).aggregate(
+            avg=Avg('score')
+        )['avg']
+        assert title.rating == pytest.approx(average), (
+            'Проверьте, что после загрузки отзывов команда `csv_load_data` '
+            'пересчитывает рейтинг произведений.'
+        )
+
+    def test_02_missing_foreign_key(self, settings, tmp_path):
+        from reviews.models import Category, Title
+
+        write_csv(tmp_path, 'category', [
+            ('id', 'name', 'slug'), ('1', 'Фильм', 'movie')
+        ])
+        write_csv(tmp_path, 'titles', [
+            ('id', 'name', 'year', 'category'),
+            ('1', 'Побег из Шоушенка', '1994', '1'),
+            ('2', 'Крестный отец', '1972', '99'),
+        ])
+        settings.CSV_FILES = str(tmp_path)
+
+        call_command('csv_load_data', '--skip-validation')
+        assert Category.objects.count() == 1
+        assert not Title.objects.exists(), (
+            'Проверьте, что при ссылке на несуществующую запись команда '
+            '`csv_load_data` не загружает таблицу частично.'
+        )
+
+    def test_03_gzip_input(self, settings, tmp_path):
+        import gzip
+
+        from reviews.models import Genre
+
+        rows = [('id', 'name', 'slug')] + [
+            (str(idx), f'Жанр {idx}', f'genre-{idx}') for idx in range(1, 26)
+        ]
+        with gzip.open(tmp_path / 'genre.csv.gz', 'wt', encoding='utf-8',
+                       newline='') as file:
+            csv.writer(file).writerows(rows)
+        settings.CSV_FILES = str(tmp_path)
+
+        call_command('csv_load_data', '--batch-size', '10')
+        assert Genre.objects.count() == len(rows) - 1, (
+            'Проверьте, что команда `csv_load_data` читает файлы, сжатые '
+            'gzip.'
+        )
+
+    def test_04_dependency_levels(self):
+        from reviews.management.commands.csv_load_data import (
+            FILES_CLASSES, dependency_levels)
+
+        levels = dependency_levels(FILES_CLASSES)
+        assert [set(level) for level in levels] == [
+            {'category', 'genre', 'users'},
+            {'titles'},
+            {'genre_title', 'review'},
+            {'comments'},
+        ], (
+            'Проверьте, что таблицы разбиваются на уровни по внешним '
+            'ключам моделей.'
+        )
+
+    def test_05_parallel_batches(self, settings, tmp_path, admin):
+        from reviews.models import Category, Comment, Review, Title
+
+        title = Title.objects.create(
+            name='Терминатор', year=1984,
+            category=Category.objects.create(name='Фильм', slug='movie')
+        )
+        review = Review.objects.create(
+            title=title, author=admin, text='Отлично', score=10
+        )
+        rows = [('id', 'review_id', 'text', 'author', 'pub_date')] + [
+            (str(idx), str(review.pk), f'Комментарий\n{idx}', str(admin.pk),
+             '2020-01-13T23:20:02.422Z')
+            for idx in range(1, 51)
+        ]
+        write_csv(tmp_path, 'comments', rows)
+        settings.CSV_FILES = str(tmp_path)
+
+        call_command('csv_load_data', '--batch-size', '7', '--workers', '2')
+        texts = list(Comment.objects.order_by('id').values_list(
+            'text', flat=True
+        ))
+        assert texts == [row[2] for row in rows[1:]], (
+            'Проверьте, что при `--workers` больше 1 команда '
+            '`csv_load_data` загружает все строки в исходном порядке.'
+        )
+
+    def test_06_resume_from_checkpoint(self, settings, tmp_path, capsys):
+        from reviews.models import Genre, ImportCheckpoint
+
+        rows = [('id', 'name', 'slug')] + [
+            (str(idx), f'Жанр {idx}', f'genre-{idx}') for idx in range(1, 26)
+        ]
+        broken = rows[:15] + [('15', 'Жанр 15', 'genre-1')] + rows[16:]
+        write_csv(tmp_path, 'genre', broken)
+        settings.CSV_FILES = str(tmp_path)
+
+        call_command('csv_load_data', '--batch-size', '10')
+        checkpoint = ImportCheckpoint.objects.get(table='genre')
+        assert (Genre.objects.count(), checkpoint.row) == (10, 10), (
+            'Проверьте, что при ошибке команда `csv_load_data` сохраняет '
+            'записанные пакеты и контрольную точку таблицы.'
+        )
+
+        write_csv(tmp_path, 'genre', rows)
+        call_command('csv_load_data', '--batch-size', '10')
+        assert Genre.objects.count() == len(rows) - 1, (
+            'Проверьте, что повторный запуск `csv_load_data` продолжает '
+            'загрузку с последнего записанного пакета.'
+        )
+        capsys.readouterr()
+
+        call_command('csv_load_data')
+        assert 'уже загружена' in capsys.readouterr().out, (
+            'Проверьте, что полностью загруженные таблицы пропускаются при '
+            'повторном запуске `csv_load_data`.'
+        )
+
+    def test_07_dry_run(self, settings, tmp_path, capsys):
+        from reviews.management.commands.csv_load_data import FILES_CLASSES
+        from reviews.models import ImportCheckpoint
+
+        call_command('csv_load_data', '--dry-run')
+        assert not any(
+            model.objects.exists() for model in FILES_CLASSES.values()
+        ) and not ImportCheckpoint.objects.exists(), (
+            'Проверьте, что в режиме `--dry-run` команда `csv_load_data` '
+            'ничего не записывает в базу.'
+        )
+        assert 'Ошибка' not in capsys.readouterr().out, (
+            'Проверьте, что в режиме `--dry-run` ссылки на записи из '
+            'проверенных файлов считаются корректными.'
+        )
+
+        write_csv(tmp_path, 'genre', [
+            ('id', 'name', 'slug'), ('1', 'Драма', 'не слаг')
+        ])
+        settings.CSV_FILES = str(tmp_path)
+        call_command('csv_load_data', '--dry-run')
+        assert 'Ошибка' in capsys.readouterr().out, (
+            'Проверьте, что в режиме `--dry-run` команда `csv_load_data` '
+            'проверяет значения полей.'
+        )
+
+    def test_08_incremental_sync(self, settings, tmp_path, capsys):
+        from reviews.models import Genre, ImportRowHash
+
+        settings.CSV_FILES = str(tmp_path)
+        write_csv(tmp_path, 'genre', [
+            ('id', 'name', 'slug'),
+            ('1', 'Драма', 'drama'),
+            ('2', 'Комедия', 'comedy'),
+            ('3', 'Вестерн', 'western'),
+        ])
+        call_command('csv_load_data', '--incremental')
+        assert Genre.objects.count() == 3
+
+        write_csv(tmp_path, 'genre', [
+            ('id', 'name', 'slug'),
+            ('1', 'Драма', 'drama'),
+            ('2', 'Комедии', 'comedy'),
+            ('4', 'Триллер', 'thriller'),
+        ])
+        hashes = set(ImportRowHash.objects.values_list('row_id', 'hash'))
+        capsys.readouterr()
+        call_command('csv_load_data', '--incremental', '--dry-run')
+        assert (
+            'Genre: добавлено 1, изменено 1, удалено 1, без изменений 1.'
+            in capsys.readouterr().out
+        ), (
+            'Проверьте, что `csv_load_data --incremental --dry-run` '
+            'выводит сводку изменений.'
+        )
+        assert set(Genre.objects.values_list('slug', flat=True)) == {
+            'drama', 'comedy', 'western'
+        } and set(
+            ImportRowHash.objects.values_list('row_id', 'hash')
+        ) == hashes, (
+            'Проверьте, что `csv_load_data --incremental --dry-run` '
+            'ничего не записывает в базу.'
+        )
+        call_command('csv_load_data', '--incremental')
+        assert (
+            'Genre: добавлено 1, изменено 1, удалено 1, без изменений 1.'
+            in capsys.readouterr().out
+        ), (
+            'Проверьте, что в режиме `--incremental` команда '
+            '`csv_load_data` выводит сводку изменений по таблице.'
+        )
+        assert dict(Genre.objects.values_list('slug', 'name')) == {
+            'drama': 'Драма', 'comedy': 'Комедии', 'thriller': 'Триллер'
+        }, (
+            'Проверьте, что в режиме `--incremental` новые и изменённые '
+            'строки записываются, а исчезнувшие удаляются.'
+        )
+
+        call_command('csv_load_data', '--incremental')
+        assert 'Итого: добавлено 0, изменено 0, удалено 0' in (
+            capsys.readouterr().out
+        ), (
+            'Проверьте, что повторная инкрементальная загрузка того же '
+            'снимка ничего не изменяет.'
+        )
+
+    def test_09_export_round_trip(self, settings, tmp_path, admin):
+        from reviews.management.commands.csv_load_data import FILES_CLASSES
+        from reviews.management.commands.export_data import export_columns
+        from reviews.models import Title
+
+        call_command('csv_load_data')
+        Title.objects.filter(pk=1).update(
+            description='Описание\nв две строки'
+        )
+        Title.objects.filter(pk=2).update(category=None)
+
+        def snapshot():
+            return {
+                model: list(model.objects.order_by('pk').values_list(
+                    *[attname for attname, _ in export_columns(model)]
+                ))
+                for model in FILES_CLASSES.values()
+            }
+
+        expected = snapshot()
+        ratings = list(Title.objects.order_by('pk').values_list('rating'))
+        for file_format in ('csv', 'ndjson'):
+            output = tmp_path / file_format
+            call_command('export_data', '--output', str(output),
+                         '--format', file_format, '--gzip',
+                         '--chunk-size', '5')
+            for model in reversed(list(FILES_CLASSES.values())):
+                model.objects.all().delete()
+            settings.CSV_FILES = str(output)
+            call_command('csv_load_data', '--restart')
+            assert snapshot() == expected, (
+                'Проверьте, что данные, выгруженные командой `export_data` '
+                f'в формате {file_format}, загружаются `csv_load_data` '
+                'без потерь.'
+            )
+            assert list(Title.objects.order_by('pk').values_list(
+                'rating'
+            )) == ratings
+
+    def test_10_fast_mode(self):
+        from django.db import connection
+
+        from reviews.fts import search_fts
+        from reviews.models import Comment, Title
+
+        def sqlite_state():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT name FROM sqlite_master "
+                    "WHERE type IN ('index', 'trigger')"
+                )
+                indexes = {name for name, in cursor.fetchall()}
+                cursor.execute('PRAGMA synchronous')
+                return indexes, cursor.fetchone()[0]
+
+        before = sqlite_state()
+        call_command('csv_load_data', '--fast')
+        assert Comment.objects.exists()
+        assert sqlite_state() == before, (
+            'Проверьте, что после загрузки в режиме `--fast` индексы '
+            'создаются заново, а настройки SQLite восстанавливаются.'
+        )
+        assert list(search_fts(Title.objects.all(), 'Шоушенк')) == [
+            Title.objects.get(name='Побег из Шоушенка')
+        ], (
+            'Проверьте, что после загрузки в режиме `--fast` '
+            'полнотекстовый индекс произведений перестраивается.'
+        )
+
+    def test_10a_fast_mode_interrupted(self):
+        from django.db import connection
+
+        from reviews.fts import search_fts
+        from reviews.management.commands.csv_load_data import (
+            FILES_CLASSES, fast_sqlite
+        )
+        from reviews.models import ImportDeferredSchema, Title
+
+        def sqlite_state():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT name FROM sqlite_master "
+                    "WHERE type IN ('index', 'trigger')"
+                )
+                indexes = {name for name, in cursor.fetchall()}
+                cursor.execute('PRAGMA journal_mode')
+                return indexes, cursor.fetchone()[0]
+
+        before = sqlite_state()
+        # Загрузка прерывается внутри блока, и finally не выполняется.
+        interrupted = fast_sqlite(FILES_CLASSES.values())
+        interrupted.__enter__()
+        Title.objects.create(id=1000, name='Прерванная загрузка', year=2000)
+        assert sqlite_state() != before
+        assert ImportDeferredSchema.objects.exists(), (
+            'Проверьте, что режим `--fast` сохраняет удалённые индексы и '
+            'триггеры в базе до их удаления.'
+        )
+
+        call_command('csv_load_data')
+        assert sqlite_state() == before, (
+            'Проверьте, что индексы, триггеры и режим журнала, удалённые '
+            'прерванной загрузкой `--fast`, восстанавливаются при '
+            'следующем запуске `csv_load_data`.'
+        )
+        assert not ImportDeferredSchema.objects.exists()
+        assert list(search_fts(Title.objects.all(), 'Прерванная')) == [
+            Title.objects.get(pk=1000)
+        ], (
+            'Проверьте, что после восстановления триггеров полнотекстовый '
+            'индекс перестраивается.'
+        )
+        interrupted.gen.close()
+
+    def test_11_genre_links_visible_in_api(self, client):
+        from django.db import IntegrityError, transaction
+
+        from reviews.models import GenreTitle
+
+        call_command('csv_load_data')
+        link = GenreTitle.objects.select_related('title', 'genre').first()
+        response = client.get(f'/api/v1/titles/{link.title_id}/')
+        assert link.genre.slug in [
+            genre['slug'] for genre in response.json()['genre']
+        ], (
+            'Проверьте, что жанры из `genre_title.csv` видны в ответе '
+            '`/api/v1/titles/{title_id}/`.'
+        )
+        response = client.get(f'/api/v1/titles/?genre={link.genre.slug}')
+        assert link.title_id in [
+            title['id'] for title in response.json()['results']
+        ], (
+            'Проверьте, что фильтр `genre` находит произведения по жанрам '
+            'из `genre_title.csv`.'
+        )
+        with pytest.raises(IntegrityError), transaction.atomic():
+            GenreTitle.objects.create(title=link.title, genre=link.genre)
+
+    def test_12_validation_before_write(self, settings, tmp_path, capsys):
+        from reviews.management.commands.csv_load_data import FILES_CLASSES
+
+        write_csv(tmp_path, 'titles', [
+            ('id', 'name', 'year', 'category'), ('1', 'Терминатор', '1984', '')
+        ])
+        write_csv(tmp_path, 'users', [
+            ('id', 'username', 'email', 'role'),
+            ('1', 'bingobongo', 'bingobongo@yamdb.fake', 'user'),
+        ])
+        rows = [('id', 'title_id', 'text', 'author', 'score', 'pub_date')]
+        for idx in range(1, 21):
+            rows.append((
+                str(idx), '1', 'Текст', '1' if idx != 7 else '99',
+                '11' if idx in (3, 15) else '5',
+                '2019-09-24T21:08:21.567Z' if idx != 9 else 'вчера'
+            ))
+        write_csv(tmp_path, 'review', rows)
+        settings.CSV_FILES = str(tmp_path)
+
+        call_command('csv_load_data', '--batch-size', '6')
+        output = capsys.readouterr().out
+        assert not any(
+            model.objects.exists() for model in FILES_CLASSES.values()
+        ), (
+            'Проверьте, что при ошибках в файлах команда `csv_load_data` '
+            'ничего не записывает в базу.'
+        )
+        assert 'score: ожидается целое число от 1 до 10 - 2 шт., строки 4, 16' in output, (
+            'Проверьте, что отчёт о проверке содержит колонку, описание '
+            'ошибки и номера строк.'
+        )
+        assert 'author: ссылка на несуществующую запись User - 1 шт., строки 8' in output
+        assert 'pub_date: ожидается дата и время в ISO 8601 - 1 шт., строки 10' in output
+
+    def test_13_generate_dataset(self, settings, tmp_path):
+        from django.db.models import Avg, Count
+
+        from reviews.management.commands.csv_load_data import FILES_CLASSES
+        from reviews.models import Comment, Review, Title
+
+        sizes = ('--categories', '3', '--genres', '8', '--titles', '40',
+                 '--users', '30', '--reviews', '300', '--comments', '500')
+        first, second = tmp_path / 'first', tmp_path / 'second'
+        call_command('generate_dataset', *sizes, '--seed', '7',
+                     '--output', str(first))
+        call_command('generate_dataset', *sizes, '--seed', '7',
+                     '--output', str(second))
+        for file_name in FILES_CLASSES:
+            assert (first / f'{file_name}.csv').read_bytes() == (
+                second / f'{file_name}.csv'
+            ).read_bytes(), (
+                'Проверьте, что команда `generate_dataset` с одинаковым '
+                '`--seed` создаёт одинаковые файлы.'
+            )
+
+        settings.CSV_FILES = str(first)
+        call_command('csv_load_data')
+        assert Review.objects.count() == 300
+        assert Comment.objects.count() == 500
+        assert not Review.objects.order_by().values(
+            'author', 'title'
+        ).annotate(
+            count=Count('id')
+        ).filter(count__gt=1).exists(), (
+            'Проверьте, что `generate_dataset` не создаёт повторных отзывов '
+            'одного автора на произведение.'
+        )
+        counts = sorted(Review.objects.order_by().values('title').annotate(
+            count=Count('id')
+        ).values_list('count', flat=True), reverse=True)
+        assert counts[0] > 3 * counts[len(counts) // 2], (
+            'Проверьте, что отзывы распределены по произведениям '
+            'неравномерно.'
+        )
+
+        for model in reversed(list(FILES_CLASSES.values())):
+            model.objects.all()._raw_delete(model.objects.db)
+        call_command('generate_dataset', *sizes, '--seed', '7', '--database')
+        assert Review.objects.count() == 300, (
+            'Проверьте, что `generate_dataset --database` записывает данные '
+            'сразу в базу.'
+        )
+        title = Title.objects.filter(reviews__isnull=False).first()
+        average = title.reviews.aggregate(avg=Avg('score'))['avg']
+        assert title.rating == pytest.approx(average), (
+            'Проверьте, что `generate_dataset --database` пересчитывает '
+            'рейтинг произведений.'
+        )
+
+    def test_14_generate_dataset_dates_at_scale(self):
+        from reviews.management.commands.generate_dataset import (
+            PERIOD, START_DATE, DatasetGenerator)
+
+        reviews = 20_000_000
+        generator = DatasetGenerator(0, 1, 1, 20000, 50000, reviews, 0)
+        dates = [generator.review_date(review_id)
+                 for review_id in (1, 400_000, reviews // 2, reviews)]
+        assert dates == sorted(dates), (
+            'Проверьте, что даты отзывов растут с их номером.'
+        )
+        assert START_DATE < dates[0] and dates[-1] < START_DATE + PERIOD, (
+            'Проверьте, что `generate_dataset` вычисляет даты отзывов без '
+            'переполнения на миллионах отзывов.'
+        )
+
+    def test_15_resume_after_interrupted_processing(self, monkeypatch):
+        from reviews.management.commands.csv_load_data import Command
+        from reviews.models import Title
+
+        def interrupt(self, loaded):
+            raise KeyboardInterrupt
+
+        with monkeypatch.context() as patch:
+            patch.setattr(Command, 'after_load', interrupt)
+            with pytest.raises(KeyboardInterrupt):
+                call_command('csv_load_data')
+        assert not Title.objects.filter(rating__isnull=False).exists()
+
+        call_command('csv_load_data')
+        rated = Title.objects.filter(reviews__isnull=False).distinct()
+        assert rated.exists() and not rated.filter(
+            rating__isnull=True
+        ).exists(), (
+            'Проверьте, что повторный запуск `csv_load_data` выполняет '
+            'пересчёт рейтинга для таблиц, загруженных прерванным запуском.'
+        )
+
+    def test_16_incremental_after_full_load(self, settings, tmp_path):
+        import shutil
+
+        from django.db.models import Avg
+
+        from reviews.models import Comment, Review, Title
+
+        call_command('csv_load_data')
+        shutil.copytree(settings.CSV_FILES, tmp_path, dirs_exist_ok=True)
+        settings.CSV_FILES = str(tmp_path)
+
+        def rewrite_csv(file_name, change):
+            with open(tmp_path / f'{file_name}.csv', encoding='utf-8',
+                      newline='') as file:
+                rows = list(csv.reader(file))
+            write_csv(tmp_path, file_name, [
+                row for row in map(change, rows) if row is not None
+            ])
+
+        rewrite_csv('comments', lambda row: None if row[0] == '1' else row)
+        call_command('csv_load_data', '--incremental')
+        assert not Comment.objects.filter(pk=1).exists(), (
+            'Проверьте, что первая загрузка в режиме `--incremental` после '
+            'обычной загрузки удаляет строки, исчезнувшие из снимка.'
+        )
+        assert Comment.objects.count() == count_csv_rows(tmp_path,
+                                                         'comments')
+
+        review = Review.objects.get(pk=1)
+        other = Title.objects.exclude(pk=review.title_id).filter(
+            reviews__isnull=False
+        ).first()
+        Title.objects.filter(pk=other.pk).update(rating=0)
+        rewrite_csv('review', lambda row: (
+            row[:4] + ['1'] + row[5:] if row[0] == '1' else row
+        ))
+        call_command('csv_load_data', '--incremental')
+        title = Title.objects.get(pk=review.title_id)
+        assert title.rating == pytest.approx(Review.objects.filter(
+            title=title
+        ).aggregate(avg=Avg('score'))['avg']), (
+            'Проверьте, что в режиме `--incremental` пересчитывается '
+            'рейтинг произведений изменённых отзывов.'
+        )
+        assert Title.objects.get(pk=other.pk).rating == 0, (
+            'Проверьте, что в режиме `--incremental` рейтинг пересчитывается '
+            'только для произведений изменённых отзывов.'
+        )
@@ -0,0 +1,424 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14SearchAPI:
+
+    def test_01_full_text_search(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        url = '/api/v1/titles/'
+
+        response = client.get(url, {'search': 'терминат'})
+        assert response.status_code == HTTPStatus.OK
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[0]['id']
+        ], (
+            f'Проверьте, что параметр `search` у `{url}` находит '
+            'произведения по началу слова в названии.'
+        )
+        response = client.get(url, {'search': 'YIPPIE'})
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[1]['id']
+        ], (
+            f'Проверьте, что параметр `search` у `{url}` ищет по описанию '
+            'без учёта регистра.'
+        )
+
+        admin_client.patch(
+            f'{url}{titles[0]["id"]}/', data={'description': 'Крепкий парень'}
+        )
+        response = client.get(url, {'search': 'крепк'})
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[1]['id'], titles[0]['id']
+        ], (
+            'Проверьте, что совпадения в названии ранжируются выше '
+            'совпадений в описании, а индекс обновляется при изменении '
+            'произведения.'
+        )
+
+        admin_client.delete(f'{url}{titles[1]["id"]}/')
+        response = client.get(url, {'search': 'крепк'})
+        assert response.json()['count'] == 1, (
+            'Проверьте, что удалённые произведения пропадают из поиска.'
+        )
+
+        for text in ('"', 'NEAR(терм', 'name:терм OR *', '  '):
+            response = client.get(url, {'search': text})
+            assert response.status_code == HTTPStatus.OK, (
+                'Проверьте, что спецсимволы FTS5 в параметре `search` '
+                'не приводят к ошибке.'
+            )
+        for text in ('', '  ', '!?'):
+            response = client.get(url, {'search': text})
+            assert response.json()['count'] == 1, (
+                f'Проверьте, что пустой параметр `search` у `{url}` не '
+                'фильтрует произведения.'
+            )
+        response = client.get(url, {'search': 'терм', 'year': 1988})
+        assert response.json()['count'] == 0, (
+            'Проверьте, что параметр `search` сочетается с фильтрами.'
+        )
+
+    def test_02_normalized_prefix_search(self, client, admin_client, admin):
+        from django.db import connection
+
+        from reviews.models import Genre, Title
+        from reviews.utils import normalize_search_key, prefix_filter
+
+        assert normalize_search_key('  Ёжик в «Тумане»!') == 'ежик в тумане'
+        assert normalize_search_key('Café Йошкар-Олы') == 'cafe йошкар олы', (
+            'Проверьте, что нормализация удаляет диакритику, но сохраняет '
+            'букву «й».'
+        )
+
+        admin_client.post('/api/v1/genres/', data={
+            'name': 'Ёлочные сказки', 'slug': 'tales'
+        })
+        admin_client.post('/api/v1/categories/', data={
+            'name': 'Кино', 'slug': 'movie'
+        })
+        for url, text in (('/api/v1/genres/', 'ЕЛОЧН'),
+                          ('/api/v1/categories/', 'кин'),
+                          ('/api/v1/genres/', 'сказк'),
+                          ('/api/v1/categories/', 'ИНО')):
+            response = client.get(url, {'search': text})
+            assert response.json()['count'] == 1, (
+                f'Проверьте, что поиск `{url}?search=` не зависит от '
+                'регистра и различия ё/е и ищет по подстроке названия.'
+            )
+        response = admin_client.get('/api/v1/users/', {'search': 'TESTAD'})
+        assert [user['username'] for user in response.json()['results']] == [
+            admin.username
+        ], (
+            'Проверьте, что поиск пользователей не зависит от регистра.'
+        )
+
+        response = admin_client.post('/api/v1/titles/', data={
+            'name': 'Ёжик в тумане', 'year': 1975, 'genre': ['tales'],
+            'category': 'movie'
+        })
+        title_id = response.json()['id']
+        response = client.get('/api/v1/titles/', {'name': 'ежик в т'})
+        assert [title['id'] for title in response.json()['results']] == [
+            title_id
+        ], (
+            'Проверьте, что фильтр `name` у `/api/v1/titles/` использует '
+            'нормализованный ключ поиска.'
+        )
+        for text in ('Тумане', 'туман ёжик'):
+            response = client.get('/api/v1/titles/', {'name': text})
+            assert [
+                title['id'] for title in response.json()['results']
+            ] == [title_id], (
+                'Проверьте, что фильтр `name` у `/api/v1/titles/` находит '
+                'произведения по началу любого слова названия.'
+            )
+
+        genre = Genre.objects.get(slug='tales')
+        genre.name = 'Зимние сказки'
+        genre.save(update_fields=['name'])
+        genre.refresh_from_db()
+        assert genre.search_name == 'зимние сказки', (
+            'Проверьте, что ключ поиска обновляется при сохранении с '
+            '`update_fields`.'
+        )
+
+        plan = Title.objects.filter(
+            prefix_filter('search_name', 'ежик')
+        ).explain()
+        if connection.vendor == 'sqlite':
+            assert 'USING INDEX' in plan and 'search_name' in plan, (
+                'Проверьте, что поиск по началу ключа использует индекс.'
+            )
+
+    def test_03_fuzzy_title_search(self, client, admin_client):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from api.cache import NAMES_VERSION_KEY, bump_names_version, get_versions
+        from api.trigram import title_index
+        from tests.utils import create_single_review
+        from reviews.models import Title
+
+        titles, _, _ = create_titles(admin_client)
+        url = '/api/v1/titles/fuzzy/'
+
+        response = client.get(url, {'q': 'терменатр'})
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что эндпоинт `{url}` доступен без авторизации.'
+        )
+        data = response.json()
+        assert data and data[0]['id'] == titles[0]['id'], (
+            f'Проверьте, что `{url}?q=` находит произведение по названию '
+            'с опечатками.'
+        )
+        assert data[0]['name'] == titles[0]['name']
+        assert 0 < data[0]['similarity'] < 1
+
+        version = title_index.version
+        admin_client.patch(
+            f'/api/v1/titles/{titles[1]["id"]}/', data={'name': 'Крепость'}
+        )
+        assert title_index.version not in (None, version), (
+            'Проверьте, что индекс триграмм обновляется сигналами без '
+            'перестроения.'
+        )
+        with CaptureQueriesContext(connection) as context:
+            data = client.get(url, {'q': 'крепост'}).json()
+        assert [title['id'] for title in data] == [titles[1]['id']], (
+            'Проверьте, что после переименования произведение ищется по '
+            'новому названию, а не по старому.'
+        )
+        assert len(context.captured_queries) == 1, (
+            'Проверьте, что при актуальном индексе из базы читаются только '
+            'названия найденных произведений.'
+        )
+
+        admin_client.delete(f'/api/v1/titles/{titles[1]["id"]}/')
+        assert client.get(url, {'q': 'крепость'}).json() == [], (
+            'Проверьте, что удалённое произведение пропадает из индекса.'
+        )
+
+        names_version = get_versions((Title,), NAMES_VERSION_KEY)
+        version = title_index.version
+        admin_client.patch(
+            f'/api/v1/titles/{titles[0]["id"]}/', data={'year': 1985}
+        )
+        create_single_review(admin_client, titles[0]['id'], 'Хорошо', 8)
+        assert get_versions((Title,), NAMES_VERSION_KEY) == names_version, (
+            'Проверьте, что изменение года и пересчёт рейтинга не сдвигают '
+            'версию названий, с которой сверяются индексы в других '
+            'процессах.'
+        )
+        assert title_index.version == version
+
+        Title.objects.filter(pk=titles[0]['id']).update(
+            name='Чужой', search_name='чужой'
+        )
+        bump_names_version(Title)
+        data = client.get(url, {'q': 'чужие'}).json()
+        assert [title['id'] for title in data] == [titles[0]['id']], (
+            'Проверьте, что индекс перестраивается после изменений в обход '
+            'сигналов, отмеченных версией в кеше.'
+        )
+        assert client.get(url).json() == []
+
+    def test_04_autocomplete(self, client, admin_client, user_client):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from tests.utils import create_single_review
+
+        titles, categories, genres = create_titles(admin_client)
+        admin_client.post('/api/v1/titles/', data={
+            'name': 'Терминал', 'year': 2004, 'genre': [genres[0]['slug']],
+            'category': categories[0]['slug']
+        })
+        create_single_review(user_client, titles[0]['id'], 'Отлично', 9)
+        url = '/api/v1/autocomplete/'
+
+        data = client.get(url, {'q': 'ТЕРМИН'}).json()
+        assert [item['name'] for item in data] == [
+            'Терминатор', 'Терминал'
+        ], (
+            f'Проверьте, что `{url}?q=` возвращает названия, начинающиеся '
+            'с запроса, популярные первыми.'
+        )
+        assert data[0] == {
+            'type': 'title', 'name': 'Терминатор', 'id': titles[0]['id']
+        }
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, {'q': 'т'})
+        assert response.status_code == HTTPStatus.OK
+        assert not context.captured_queries, (
+            f'Проверьте, что `{url}` отвечает без запросов к базе данных, '
+            'пока данные не изменились.'
+        )
+        assert len(client.get(url, {'q': 'т', 'limit': 1}).json()) == 1
+
+        genre = genres[0]
+        data = client.get(url, {'q': genre['name'][:4]}).json()
+        assert {'type': 'genre', 'name': genre['name'],
+                'slug': genre['slug']} in data, (
+            f'Проверьте, что `{url}` подсказывает названия жанров.'
+        )
+
+        admin_client.patch(
+            f'/api/v1/titles/{titles[0]["id"]}/', data={'name': 'Чужой'}
+        )
+        assert [
+            item['name'] for item in client.get(url, {'q': 'чуж'}).json()
+        ] == ['Чужой'], (
+            f'Проверьте, что индекс `{url}` обновляется при изменении '
+            'названия.'
+        )
+        assert client.get(url, {'q': ''}).json() == []
+
+    def test_05_moderation_text_search(self, client, admin_client, user_client,
+                                       moderator_client, user, moderator):
+        from django.contrib import admin
+
+        from reviews.models import Comment, Review
+        from tests.utils import create_single_comment, create_single_review
+
+        titles, _, _ = create_titles(admin_client)
+        spam = create_single_review(
+            user_client, titles[0]['id'], 'Дешёвые билеты по ссылке!', 1
+        ).json()
+        create_single_review(
+            moderator_client, titles[0]['id'], 'Отличный фильм', 9
+        )
+        other = create_single_review(
+            user_client, titles[1]['id'], 'Скучно, но билеты дешёвые', 3
+        ).json()
+        comment = create_single_comment(
+            moderator_client, titles[0]['id'], spam['id'],
+            'Это спам, а не отзыв'
+        ).json()
+        url = '/api/v1/moderation/reviews/'
+
+        for api_client in (client, user_client):
+            response = api_client.get(url, {'search': 'билет'})
+            assert response.status_code in (
+                HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN
+            ), (
+                f'Проверьте, что `{url}` доступен только модераторам и '
+                'администраторам.'
+            )
+
+        response = moderator_client.get(url, {'search': 'билеты дешёвые'})
+        assert response.status_code == HTTPStatus.OK
+        assert {review['id'] for review in response.json()['results']} == {
+            spam['id'], other['id']
+        }, (
+            f'Проверьте, что `{url}?search=` находит отзывы по словам '
+            'текста в любом порядке.'
+        )
+        assert response.json()['results'][0]['title'] in (
+            titles[0]['id'], titles[1]['id']
+        )
+        response = moderator_client.get(url, {
+            'search': 'билет', 'author': user.username,
+            'title': titles[1]['id']
+        })
+        assert [review['id'] for review in response.json()['results']] == [
+            other['id']
+        ], (
+            f'Проверьте, что `{url}` фильтрует по автору и произведению.'
+        )
+        response = admin_client.get(url, {
+            'search': 'билет', 'pub_date_after': '2100-01-01T00:00:00Z'
+        })
+        assert response.json()['count'] == 0, (
+            f'Проверьте, что `{url}` фильтрует по диапазону дат.'
+        )
+
+        admin_client.patch(
+            f'/api/v1/titles/{titles[1]["id"]}/reviews/{other["id"]}/',
+            data={'text': 'Скучно'}
+        )
+        response = moderator_client.get(url, {'search': 'билет'})
+        assert [review['id'] for review in response.json()['results']] == [
+            spam['id']
+        ], (
+            'Проверьте, что индекс отзывов обновляется при изменении текста.'
+        )
+
+        response = moderator_client.get(
+            '/api/v1/moderation/comments/',
+            {'search': 'спам', 'title': titles[0]['id']}
+        )
+        data = response.json()['results']
+        assert [item['id'] for item in data] == [comment['id']], (
+            'Проверьте, что `/api/v1/moderation/comments/?search=` находит '
+            'комментарии по тексту.'
+        )
+        assert data[0]['review'] == spam['id']
+        assert data[0]['title'] == titles[0]['id']
+
+        review_admin = admin.site._registry[Review]
+        found, _ = review_admin.get_search_results(
+            None, Review.objects.all(), 'дешёвые'
+        )
+        assert list(found) == [Review.objects.get(pk=spam['id'])], (
+            'Проверьте, что поиск в админке отзывов использует '
+            'полнотекстовый индекс.'
+        )
+        found, _ = admin.site._registry[Comment].get_search_results(
+            None, Comment.objects.all(), moderator.username
+        )
+        assert found.count() == 1, (
+            'Проверьте, что в админке комментариев работает поиск по автору.'
+        )
+
+    def test_06_indexes_catch_up_from_change_log(self, admin_client,
+                                                 monkeypatch):
+        from api.autocomplete import AutocompleteIndex
+        from api.cache import bump_names_version
+        from api.trigram import TrigramIndex
+        from reviews.models import Genre, Title
+
+        titles, categories, genres = create_titles(admin_client)
+        # Индексы другого процесса: построены до изменений в этом.
+        trigram, autocomplete = TrigramIndex(), AutocompleteIndex()
+        trigram.build()
+        autocomplete.build()
+        loads = []
+        for index in (trigram, autocomplete):
+            monkeypatch.setattr(index, 'load', lambda: loads.append(1))
+
+        admin_client.patch(
+            f'/api/v1/titles/{titles[0]["id"]}/', data={'name': 'Чужой'}
+        )
+        admin_client.delete(f'/api/v1/titles/{titles[1]["id"]}/')
+        admin_client.post('/api/v1/titles/', data={
+            'name': 'Чужие', 'year': 1986, 'genre': [genres[0]['slug']],
+            'category': categories[0]['slug']
+        })
+        genre = Genre.objects.get(slug=genres[0]['slug'])
+        genre.name = 'Хоррор'
+        genre.save()
+
+        assert [title_id for title_id, _ in trigram.search('чужой')] == [
+            titles[0]['id'], Title.objects.get(name='Чужие').pk
+        ] and trigram.search('крепкий орешек') == [], (
+            'Проверьте, что индекс триграмм другого процесса применяет '
+            'изменения названий из журнала в кеше.'
+        )
+        assert [item['name'] for item in autocomplete.search('чуж')] == [
+            'Чужие', 'Чужой'
+        ] and autocomplete.search('крепк') == [], (
+            'Проверьте, что индекс подсказок другого процесса применяет '
+            'изменения названий из журнала в кеше.'
+        )
+        assert autocomplete.search('хор') == [
+            {'type': 'genre', 'name': 'Хоррор', 'slug': genres[0]['slug']}
+        ]
+        assert autocomplete.search('ужас') == []
+        assert not loads, (
+            'Проверьте, что индексы других процессов догоняют изменения '
+            'без перестроения.'
+        )
+
+        bump_names_version(Title)
+        trigram.search('чужой')
+        assert loads, (
+            'Проверьте, что после изменений в обход сигналов индекс '
+            'перестраивается.'
+        )
+
+    def test_07_indexes_warm_up(self, admin_client):
+        from api.indexes import NAME_INDEXES, warm_up_indexes
+
+        create_titles(admin_client)
+        for index in NAME_INDEXES:
+            index.invalidate()
+        warm_up_indexes().join()
+        assert all(index.version is not None for index in NAME_INDEXES), (
+            'Проверьте, что индексы названий строятся при старте процесса.'
+        )